@@ -1,16 +1,51 @@
 __version__ = '0.1'
 
+import sys
+from types import ModuleType
 
-from .views.base import LeafCompositeView
-from .views.base import StackedCompositeView
-from .views.base import StackedCompositeViewWithPost
-from .views.base import NamespacedCompositeView
-from .views.base import NamespacedCompositeViewWithPost
-from .views.base import CompositeHierarchyHasPostMixin
-from .views.base import RenderableTemplateViewMixin
+from django.utils.importlib import import_module
 
-from .views.composites import SortableTable
-from .views.composites import ChangeList
-from .views.composites import Filter
 
-from .urls import UrlCollection
+# exported names and the module they are imported from the first time they
+# are used so that ``import composite`` only imports what is needed, e.g.
+# ``SortableTable`` imports the admin and the forms while
+# ``LeafCompositeView`` doesn't
+EXPORTS = dict(
+    LeafCompositeView='.views.base',
+    StackedCompositeView='.views.base',
+    StackedCompositeViewWithPost='.views.base',
+    NamespacedCompositeView='.views.base',
+    NamespacedCompositeViewWithPost='.views.base',
+    CompositeHierarchyHasPostMixin='.views.base',
+    RenderableTemplateViewMixin='.views.base',
+    SortableTable='.views.composites',
+    ChangeList='.views.composites',
+    Filter='.views.composites',
+    UrlCollection='.urls',
+)
+
+
+class LazyExportsModule(ModuleType):
+    """Module of the package that imports the ``EXPORTS`` on access"""
+
+    def __getattr__(self, name):
+        try:
+            module = EXPORTS[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute %r" % name)
+        value = getattr(import_module(module, __name__), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(EXPORTS))
+
+
+# Python 2 has no module level __getattr__, replace the module by a
+# LazyExportsModule with the same attributes, the original module is kept
+# alive so that the globals of this file are not cleared
+module = LazyExportsModule(__name__, __doc__)
+module.__dict__.update(sys.modules[__name__].__dict__)
+module.__all__ = sorted(EXPORTS)
+module._module = sys.modules[__name__]
+sys.modules[__name__] = module
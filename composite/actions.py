@@ -0,0 +1,130 @@
+"""Bulk actions applied by ``ChangeList`` to selected objects.
+
+An action is a callable that takes a queryset and does something with its
+objects, it has a ``short_description`` attribute used in the action
+select box:
+
+.. code-block:: python
+
+   def mark_as_published(queryset):
+       queryset.update(status='published')
+   mark_as_published.short_description = 'Mark as published'
+
+
+   class ArticleChangeList(ChangeList):
+
+       actions = (delete_selected, mark_as_published)
+
+Actions are run by a ``Job`` which applies the action to chunks of objects
+in primary key order, each chunk in its own transaction, so that a large
+selection doesn't end up in a giant transaction. The progress of jobs is
+stored in the cache so that it can be polled from any process.
+"""
+import threading
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import close_connection
+from django.db import transaction
+from django.utils.encoding import force_text
+from django.utils.translation import ugettext_lazy
+
+from .cache import invalidate
+
+
+# seconds the progress of a job is kept
+JOB_TIMEOUT = 60 * 60 * 24
+
+
+def delete_selected(queryset):
+    queryset.delete()
+delete_selected.short_description = ugettext_lazy('Delete selected objects')
+
+
+class Job(object):
+    """Applies ``action`` to the objects of ``queryset`` ``chunk_size``
+    objects at a time.
+
+    Use ``run`` to apply the action in the current thread or ``start``
+    to apply it in a background thread, use ``Job.progress`` with the
+    ``id`` of the job to know how it's going.
+    """
+
+    def __init__(self, action, queryset, chunk_size=1000):
+        self.id = uuid4().hex
+        self.action = action
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.total = queryset.count()
+        self.done = 0
+        self.save_progress('pending')
+
+    @staticmethod
+    def key(id):
+        return 'composite:job:%s' % id
+
+    @classmethod
+    def progress(cls, id):
+        """Returns a dictionary with the ``status``, the number of objects
+        ``done`` out of ``total`` and the ``error`` if any of the job ``id``
+        or ``None`` if the job is unknown"""
+        return cache.get(cls.key(id))
+
+    def save_progress(self, status, error=None):
+        progress = dict(
+            status=status,
+            done=self.done,
+            total=self.total,
+            error=error,
+        )
+        cache.set(self.key(self.id), progress, JOB_TIMEOUT)
+
+    def chunks(self):
+        """Generator over lists of primary keys of the objects to process,
+        every list is fetched when the previous one is processed so that
+        objects changed by the action are not processed twice"""
+        qs = self.queryset.order_by('pk').values_list('pk', flat=True)
+        last = None
+        while True:
+            chunk = qs if last is None else qs.filter(pk__gt=last)
+            chunk = list(chunk[:self.chunk_size])
+            if not chunk:
+                break
+            yield chunk
+            last = chunk[-1]
+
+    def run(self):
+        """Applies the action to every chunk in its own transaction"""
+        model = self.queryset.model
+        using = self.queryset.db
+        self.save_progress('running')
+        try:
+            for pks in self.chunks():
+                with transaction.commit_on_success(using=using):
+                    self.action(model._default_manager.using(using).filter(pk__in=pks))
+                # actions like ``update`` send no signal, forget the cached
+                # results of the model
+                invalidate(model)
+                self.done += len(pks)
+                self.save_progress('running')
+        except Exception as exception:
+            self.save_progress('failed', force_text(exception))
+            raise
+        else:
+            self.save_progress('done')
+
+    def _run_in_thread(self):
+        try:
+            self.run()
+        except Exception:
+            pass  # the error is in the progress
+        finally:
+            # the thread has its own connection
+            close_connection()
+
+    def start(self):
+        """Runs the job in a background thread"""
+        thread = threading.Thread(target=self._run_in_thread)
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -0,0 +1,130 @@
+"""Helpers to cache values computed from the rows of some models.
+
+Cache keys are made of a *generation* per model, the generation of a
+model is changed each time an object of a model watched with ``watch``
+is saved or deleted, so keys computed before the change are never used
+again and old entries expire on their own.
+"""
+import numbers
+import struct
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+
+# generations must outlive the entries that use them
+GENERATION_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def model_label(model):
+    return '%s.%s' % (model._meta.app_label, model._meta.object_name.lower())
+
+
+def generation_key(model):
+    return 'composite:generation:%s' % model_label(model)
+
+
+def get_generations(models):
+    """Returns the list of the current generations of ``models``"""
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # start a new generation, a generation is never reused so that
+            # entries made before an eviction are not reused
+            cache.add(key, uuid4().hex, GENERATION_TIMEOUT)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate(model):
+    """Starts a new generation for ``model``"""
+    cache.set(generation_key(model), uuid4().hex, GENERATION_TIMEOUT)
+
+
+def _invalidate_sender(sender, **kwargs):
+    invalidate(sender)
+
+
+def watch(model):
+    """Invalidates ``model`` each time one of its objects is saved or
+    deleted, it's safe to call several times"""
+    uid = 'composite.cache.%s' % model_label(model)
+    post_save.connect(_invalidate_sender, sender=model, dispatch_uid=uid)
+    post_delete.connect(_invalidate_sender, sender=model, dispatch_uid=uid)
+
+
+def make_key(prefix, models, *parts):
+    """Returns a key for ``prefix`` and ``parts`` that changes when one
+    of ``models`` changes, ``models`` are watched"""
+    for model in models:
+        watch(model)
+    parts = (get_generations(models),) + parts
+    digest = md5(repr(parts)).hexdigest()
+    return 'composite:%s:%s' % (prefix, digest)
+
+
+def pack_pks(pks):
+    """Returns the integer primary keys ``pks`` packed as little endian
+    64 bits integers or ``None`` if they are not all integers"""
+    # struct truncates floats and decimals
+    if not all(isinstance(pk, numbers.Integral) for pk in pks):
+        return None
+    try:
+        return struct.pack('<%dq' % len(pks), *pks)
+    except struct.error:
+        return None
+
+
+def unpack_pks(data):
+    """Returns the tuple of the primary keys packed in ``data``"""
+    return struct.unpack('<%dq' % (len(data) // 8), data)
+
+
+class PackedPks(object):
+    """Read only sequence of the primary keys packed in ``data`` by
+    ``pack_pks``, keys are only unpacked when they are read so that the
+    sequence takes 8 bytes per key"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // 8
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                return unpack_pks(self.data)[index]
+            size = max(stop - start, 0)
+            return struct.unpack_from('<%dq' % size, self.data, start * 8)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError('primary key index out of range')
+        return struct.unpack_from('<q', self.data, index * 8)[0]
+
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self[index]
+
+
+def compact_pks(pks):
+    """Returns the primary keys of the iterable ``pks`` in a ``PackedPks``
+    if they are all integers otherwise in a list, they are packed while
+    they are read so that they are never all held in a list"""
+    data = bytearray()
+    pks = iter(pks)
+    for pk in pks:
+        try:
+            if not isinstance(pk, numbers.Integral):
+                raise struct.error
+            data += struct.pack('<q', pk)
+        except struct.error:
+            return list(PackedPks(data)) + [pk] + list(pks)
+    return PackedPks(data)
@@ -0,0 +1,167 @@
+"""List filters of the ``Filter`` composite that cache their choices.
+
+``RelatedFieldListFilter`` and ``AllValuesFieldListFilter`` from Django
+admin query the database for their choices each time they are built, the
+filters of this module are the same except the choices are cached for
+``Filter.choices_cache_timeout`` seconds per model, field path and
+``Filter.get_choices_cache_scope``. The cache entries are invalidated when
+an object of the model the choices come from is saved or deleted.
+
+It also computes the facet counts displayed by ``Filter`` next to the
+choices of the field filters when ``Filter.show_facets`` is true.
+"""
+from django.contrib.admin import filters
+from django.contrib.admin.util import get_model_from_relation
+from django.contrib.admin.util import lookup_needs_distinct
+from django.contrib.admin.util import reverse_field_path
+from django.db import models
+from django.http import QueryDict
+from django.utils.encoding import smart_unicode
+
+from . import cache
+from .cache import model_label
+
+
+def cached_choices(model_admin, model, field_path, source_model, compute):
+    """Returns the choices computed by ``compute`` for the filter of
+    ``field_path`` of ``model``, cached until ``source_model`` changes"""
+    key = cache.make_key(
+        'filter_choices',
+        (source_model,),
+        model_label(model),
+        field_path,
+        model_admin.get_choices_cache_scope(),
+    )
+    choices = cache.cache.get(key)
+    if choices is None:
+        choices = list(compute())
+        cache.cache.set(key, choices, model_admin.choices_cache_timeout)
+    return choices
+
+
+class RelatedFieldListFilter(filters.RelatedFieldListFilter):
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        # same as Django's except for ``lookup_choices``
+        other_model = get_model_from_relation(field)
+        if hasattr(field, 'rel'):
+            rel_name = field.rel.get_related_field().name
+        else:
+            rel_name = other_model._meta.pk.name
+        self.lookup_kwarg = '%s__%s__exact' % (field_path, rel_name)
+        self.lookup_kwarg_isnull = '%s__isnull' % field_path
+        self.lookup_val = request.GET.get(self.lookup_kwarg, None)
+        self.lookup_val_isnull = request.GET.get(
+                                      self.lookup_kwarg_isnull, None)
+        self.lookup_choices = cached_choices(
+            model_admin,
+            model,
+            field_path,
+            other_model,
+            lambda: field.get_choices(include_blank=False),
+        )
+        filters.FieldListFilter.__init__(
+            self, field, request, params, model, model_admin, field_path)
+        if hasattr(field, 'verbose_name'):
+            self.lookup_title = field.verbose_name
+        else:
+            self.lookup_title = other_model._meta.verbose_name
+        self.title = self.lookup_title
+
+
+class AllValuesFieldListFilter(filters.AllValuesFieldListFilter):
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        # Django's lookup_choices is a lazy queryset, replace it before it
+        # is evaluated
+        super(AllValuesFieldListFilter, self).__init__(
+            field, request, params, model, model_admin, field_path)
+        parent_model, reverse_path = reverse_field_path(model, field_path)
+        self.lookup_choices = cached_choices(
+            model_admin,
+            model,
+            field_path,
+            parent_model,
+            lambda: self.lookup_choices,
+        )
+
+
+# Django admin filters replaced by the filters of this module
+CACHED_FILTERS = {
+    filters.RelatedFieldListFilter: RelatedFieldListFilter,
+    filters.AllValuesFieldListFilter: AllValuesFieldListFilter,
+}
+
+
+def create(field, request, params, model, model_admin, field_path):
+    """Same as ``FieldListFilter.create`` except the filters that have
+    a caching counterpart in this module are replaced by it if
+    ``model_admin.choices_cache_timeout`` is not ``None``"""
+    for test, list_filter_class in filters.FieldListFilter._field_list_filters:
+        if not test(field):
+            continue
+        if model_admin.choices_cache_timeout is not None:
+            list_filter_class = CACHED_FILTERS.get(list_filter_class, list_filter_class)
+        return list_filter_class(field, request, params,
+            model, model_admin, field_path=field_path)
+
+
+# name of the attribute of the filters that holds the isnull lookup
+ISNULL_ATTRIBUTES = {
+    filters.RelatedFieldListFilter: 'lookup_kwarg_isnull',
+    filters.BooleanFieldListFilter: 'lookup_kwarg2',
+    filters.ChoicesFieldListFilter: None,
+    filters.AllValuesFieldListFilter: 'lookup_kwarg_isnull',
+}
+
+
+def has_facets(spec):
+    """Returns whether facet counts can be computed for ``spec``, that is
+    whether it's one of the field filters with one value per choice"""
+    return isinstance(spec, tuple(ISNULL_ATTRIBUTES))
+
+
+def facet_value(value):
+    """Returns ``value`` as found in the query string of the choices"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return smart_unicode(value)
+
+
+class Facets(object):
+    """Counts of the objects of a queryset for each value of the field of
+    a filter, computed with one grouped query"""
+
+    def __init__(self, spec, queryset):
+        self.spec = spec
+        rows = (queryset
+                .order_by()
+                .values(spec.field_path)
+                .annotate(facet_count=models.Count('pk', distinct=True)))
+        self.counts = dict()
+        for row in rows:
+            self.counts[facet_value(row[spec.field_path])] = row['facet_count']
+        if lookup_needs_distinct(queryset.model._meta, spec.field_path):
+            # an object is counted once per related object
+            self.total = None
+        else:
+            self.total = sum(self.counts.values())
+
+    def isnull_kwarg(self):
+        for list_filter_class, attribute in ISNULL_ATTRIBUTES.items():
+            if isinstance(self.spec, list_filter_class):
+                return getattr(self.spec, attribute) if attribute else None
+
+    def count(self, choice):
+        """Returns the count of ``choice`` as returned by the ``choices``
+        method of the filter, ``None`` if it's not known"""
+        params = QueryDict(choice['query_string'].lstrip('?'))
+        isnull_kwarg = self.isnull_kwarg()
+        if isnull_kwarg and params.get(isnull_kwarg):
+            return self.counts.get(None, 0)
+        value = params.get(self.spec.lookup_kwarg)
+        if value is None:
+            return self.total
+        return self.counts.get(value, 0)
@@ -1,7 +1,8 @@
-from django.core.urlresolvers import reverse
 from django.http import HttpResponseForbidden
 from django.contrib.auth.views import redirect_to_login
 
+from .urls import reverse
+
 
 class LoginRequiredMixin(object):
 
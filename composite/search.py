@@ -0,0 +1,224 @@
+"""Search backends used by ``SortableTable`` to apply the search query
+found in the request to the queryset.
+
+A backend is an object with a ``search(table, queryset, query)`` method
+that returns a ``(queryset, use_distinct)`` tuple. The default backend
+is ``IContainsSearchBackend`` which does what Django admin does, you can
+set another one using the ``search_backend`` attribute of the table:
+
+.. code-block:: python
+
+   from composite.search import SQLiteFTS5SearchBackend
+
+
+   class BookTable(SortableTable):
+
+       search_backend = SQLiteFTS5SearchBackend(Book, ('title', 'summary'))
+"""
+import operator
+
+from django.contrib.admin.util import lookup_needs_distinct
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db import connections
+from django.db import models
+
+
+class SearchBackend(object):
+    """Base class of search backends"""
+
+    def search(self, table, queryset, query):
+        """Returns a ``(queryset, use_distinct)`` tuple where ``queryset`` is
+        filtered against ``query`` and ``use_distinct`` tells whether the
+        queryset needs ``distinct()`` to avoid duplicates"""
+        raise NotImplementedError
+
+    def rank(self, table, queryset, query, ordering):
+        """Returns a ``(queryset, ordering)`` tuple used to order the results
+        of ``query`` when the user didn't pick an ordering, backends that
+        know how relevant the objects are put the best matches first"""
+        return queryset, ordering
+
+
+class IContainsSearchBackend(SearchBackend):
+    """Search every ``table.search_fields`` with a ``LIKE`` query.
+
+    Search fields can be prefixed like in Django admin:
+
+    - ``^`` for a lookup with ``istartswith``
+    - ``=`` for a lookup with ``iexact``
+    - ``@`` for a lookup with ``search``
+    """
+
+    def construct_search(self, field_name):
+        if field_name.startswith('^'):
+            return "%s__istartswith" % field_name[1:]
+        elif field_name.startswith('='):
+            return "%s__iexact" % field_name[1:]
+        elif field_name.startswith('@'):
+            return "%s__search" % field_name[1:]
+        else:
+            return "%s__icontains" % field_name
+
+    def search(self, table, queryset, query):
+        use_distinct = False
+        if table.search_fields and query:
+            orm_lookups = [self.construct_search(str(search_field))
+                           for search_field in table.search_fields]
+            for bit in query.split():
+                or_queries = [models.Q(**{orm_lookup: bit})
+                              for orm_lookup in orm_lookups]
+                queryset = queryset.filter(reduce(operator.or_, or_queries))
+            for search_spec in orm_lookups:
+                if lookup_needs_distinct(table.model_class._meta, search_spec):
+                    use_distinct = True
+                    break
+        return queryset, use_distinct
+
+
+class SQLiteFTS5SearchBackend(SearchBackend):
+    """Search through a SQLite FTS5 shadow index of ``fields`` of ``model``.
+
+    The index is a virtual table named after the model table with a
+    ``_fts`` suffix, the ``rowid`` of a row is the primary key of the
+    indexed object. It's created on first use and kept in sync with
+    ``post_save`` and ``post_delete`` signals, use ``rebuild`` to index
+    objects that existed before. Since creating the index commits the
+    current transaction, you'd better call ``create_index`` or ``rebuild``
+    when deploying rather than let the first save do it.
+
+    Only concrete fields of ``model`` can be indexed since changes to related
+    objects do not trigger the signals of ``model``.
+
+    Every word of the query must match (as a prefix) in at least one of
+    the fields. The queryset is joined once with the matching rows of the
+    index and unless the user picked an ordering the results are ranked
+    with ``bm25``, best match first. If ``max_results`` is set only that
+    many of the best matches are kept.
+    """
+
+    max_results = None
+    # name of the ``extra`` select holding the rank of the objects
+    rank_name = 'composite_search_rank'
+
+    def __init__(self, model, fields, using='default', max_results=None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.using = using
+        if max_results is not None:
+            self.max_results = max_results
+        names = [field.name for field in model._meta.fields]
+        for field in self.fields:
+            if field not in names:
+                msg = "%s has no concrete field %r to index" % (model.__name__, field)
+                raise ImproperlyConfigured(msg)
+        self.table_name = '%s_fts' % model._meta.db_table
+        self._created = False
+        uid = 'composite.search.%s' % self.table_name
+        post_save.connect(self._post_save, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self._post_delete, sender=model, weak=False, dispatch_uid=uid)
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def _execute(self, sql, params=()):
+        """Executes ``sql`` where ``{table}`` is replaced by the quoted
+        name of the index"""
+        sql = sql.replace('{table}', self.connection.ops.quote_name(self.table_name))
+        cursor = self.connection.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def create_index(self):
+        """Creates the virtual table if it doesn't exists yet"""
+        # the sqlite3 module commits the current transaction before
+        # executing DDL statements, look the table up first so that
+        # it only happens once
+        if self._created:
+            return
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s"
+        if not self._execute(sql, [self.table_name]).fetchone():
+            columns = ', '.join(self.connection.ops.quote_name(f) for f in self.fields)
+            self._execute('CREATE VIRTUAL TABLE {table} USING fts5(%s)' % columns)
+        self._created = True
+
+    def _values(self, object):
+        values = list()
+        for field in self.fields:
+            value = getattr(object, field)
+            values.append(u'' if value is None else unicode(value))
+        return values
+
+    def index(self, object):
+        """Adds or replaces ``object`` in the index"""
+        self.create_index()
+        self.unindex(object.pk)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        sql = 'INSERT INTO {table} (rowid, %s) VALUES (%s)' % (
+            ', '.join(self.connection.ops.quote_name(f) for f in self.fields),
+            placeholders,
+        )
+        self._execute(sql, [object.pk] + self._values(object))
+
+    def unindex(self, pk):
+        self.create_index()
+        self._execute('DELETE FROM {table} WHERE rowid = %s', [pk])
+
+    def rebuild(self):
+        """Indexes every object of the model"""
+        self.create_index()
+        self._execute('DELETE FROM {table}')
+        for object in self.model._default_manager.all().iterator():
+            self.index(object)
+
+    def _post_save(self, sender, instance, raw=False, using=None, **kwargs):
+        if not raw and (using or self.using) == self.using:
+            self.index(instance)
+
+    def _post_delete(self, sender, instance, using=None, **kwargs):
+        if (using or self.using) == self.using:
+            self.unindex(instance.pk)
+
+    def match_expression(self, query):
+        """Returns the FTS5 query for the user input ``query``, every word
+        is quoted so that FTS5 operators typed by the user are not
+        interpreted"""
+        bits = ['"%s"*' % bit.replace('"', '""') for bit in query.split()]
+        return ' '.join(bits)
+
+    def _joined(self, queryset, query):
+        """Returns ``queryset`` joined once with the rows of the index
+        matching ``query``"""
+        if self.table_name in queryset.query.extra_tables:
+            return queryset
+        self.create_index()
+        quote_name = self.connection.ops.quote_name
+        meta = self.model._meta
+        fts = quote_name(self.table_name)
+        pk = '%s.%s' % (quote_name(meta.db_table), quote_name(meta.pk.column))
+        where = ['%s MATCH %%s' % fts, '%s.rowid = %s' % (fts, pk)]
+        params = [self.match_expression(query)]
+        if self.max_results is not None:
+            # the best matches are picked once by a subquery
+            where.append(
+                '%s.rowid IN (SELECT rowid FROM %s WHERE %s MATCH %%s '
+                'ORDER BY rank LIMIT %%s)' % (fts, fts, fts)
+            )
+            params.extend([self.match_expression(query), self.max_results])
+        return queryset.extra(tables=[self.table_name], where=where, params=params)
+
+    def search(self, table, queryset, query):
+        if not query.split():
+            return queryset, False
+        return self._joined(queryset, query), False
+
+    def rank(self, table, queryset, query, ordering):
+        if not query.split():
+            return queryset, ordering
+        # ``rank`` is the bm25 score of the joined row, the lower the better
+        queryset = self._joined(queryset, query).extra(
+            select={self.rank_name: '%s.rank' % self.connection.ops.quote_name(self.table_name)},
+        )
+        return queryset, [self.rank_name] + list(ordering)
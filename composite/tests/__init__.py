@@ -1,2 +1,8 @@
 from .views import *
 from .urls import *
+from .imports import *
+from .composites import *
+from .search import *
+from .actions import *
+from .cache import *
+from .filters import *
@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from .. import cache
+from ..actions import Job
+
+
+def deactivate(queryset):
+    queryset.update(is_active=False)
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        for index in range(5):
+            User.objects.create(username='user%s' % index)
+
+    def test_run_by_chunks(self):
+        job = Job(deactivate, User.objects.all(), chunk_size=2)
+        job.run()
+        self.assertEqual(User.objects.filter(is_active=True).count(), 0)
+        progress = Job.progress(job.id)
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['done'], 5)
+
+    def test_run_invalidates_the_cache(self):
+        key = cache.make_key('test', (User,))
+        Job(deactivate, User.objects.all()).run()
+        self.assertNotEqual(cache.make_key('test', (User,)), key)
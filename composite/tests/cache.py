@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from ..cache import PackedPks
+from ..cache import compact_pks
+from ..cache import pack_pks
+from ..cache import unpack_pks
+
+
+class PackPksTests(TestCase):
+
+    def test_round_trip(self):
+        pks = [3, 1, -2, 0, 2 ** 62]
+        data = pack_pks(pks)
+        self.assertEqual(len(data), 8 * len(pks))
+        self.assertEqual(unpack_pks(data), tuple(pks))
+
+    def test_empty(self):
+        self.assertEqual(unpack_pks(pack_pks([])), ())
+
+    def test_not_integers(self):
+        self.assertEqual(pack_pks(['a', 'b']), None)
+        self.assertEqual(pack_pks([1.5]), None)
+        self.assertEqual(pack_pks([Decimal(1)]), None)
+
+    def test_too_large(self):
+        self.assertEqual(pack_pks([2 ** 64]), None)
+
+
+class PackedPksTests(TestCase):
+
+    def test_sequence(self):
+        pks = PackedPks(pack_pks([3, 1, 4, 1, 5]))
+        self.assertEqual(len(pks), 5)
+        self.assertEqual(pks[0], 3)
+        self.assertEqual(pks[-1], 5)
+        self.assertEqual(pks[1:3], (1, 4))
+        self.assertEqual(pks[3:10], (1, 5))
+        self.assertEqual(pks[::2], (3, 4, 5))
+        self.assertEqual(list(pks), [3, 1, 4, 1, 5])
+        self.assertRaises(IndexError, lambda: pks[5])
+
+    def test_compact(self):
+        pks = compact_pks(iter([3, 1, 4]))
+        self.assertTrue(isinstance(pks, PackedPks))
+        self.assertEqual(tuple(pks), (3, 1, 4))
+        self.assertEqual(compact_pks(iter([3, 'a', 4])), [3, 'a', 4])
+        self.assertEqual(compact_pks(iter([3, 2 ** 64])), [3, 2 ** 64])
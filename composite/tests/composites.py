@@ -0,0 +1,657 @@
+import json
+from datetime import datetime
+
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import connection
+from django.db import models
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from ..actions import Job
+from ..actions import delete_selected
+from ..views.base import StackedCompositeViewWithPost
+from ..views.composites import ChangeList
+from ..views.composites import Filter
+from ..views.composites import QueryState
+from ..views.composites import RelationPlan
+from ..views.composites import SortableTable
+from ..views.composites import supports_window_count
+
+
+class SavingUser(User):
+    """User whose ``save`` must be called"""
+
+    class Meta:
+        proxy = True
+        app_label = 'composite'
+
+    def save(self, *args, **kwargs):
+        self.last_name = 'saved'
+        super(SavingUser, self).save(*args, **kwargs)
+
+
+class Note(models.Model):
+
+    text = models.CharField(max_length=100)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'composite'
+
+
+class UserTable(SortableTable):
+
+    model_class = User
+    list_display = ('username', 'is_staff')
+    ordering = ('username',)
+    search_fields = ('username',)
+    export_chunk_size = 3
+
+
+class UserFilter(Filter):
+
+    list_filter = ('is_staff',)
+
+
+class UserPage(StackedCompositeViewWithPost):
+
+    template_name = 'stacked.html'
+    table_class = UserTable
+
+    def _composites(self, request, *args, **kwargs):
+        filter = UserFilter(parent=self, model_class=User)
+        yield filter
+        yield self.table_class(parent=self, filter=filter)
+
+
+class QueryStateTests(TestCase):
+
+    def test_parameters_are_sorted(self):
+        one = QueryState(QueryDict('b=2&a=1'))
+        two = QueryState(QueryDict('a=1&b=2'))
+        self.assertEqual(one.query_string(), '?a=1&b=2')
+        self.assertEqual(two.query_string(), '?a=1&b=2')
+        self.assertEqual(one.query_string(dict(d=4, c=3)), '?a=1&b=2&c=3&d=4')
+        self.assertEqual(one.query_string(dict(c=3, d=4)), '?a=1&b=2&c=3&d=4')
+
+    def test_new_parameters_replace_the_old_ones(self):
+        state = QueryState(QueryDict('p=2&q=foo'))
+        self.assertEqual(state.query_string(dict(p=3)), '?p=3&q=foo')
+
+    def test_none_removes_a_parameter(self):
+        state = QueryState(QueryDict('p=2&q=foo'))
+        self.assertEqual(state.query_string(dict(p=None)), '?q=foo')
+        self.assertEqual(state.query_string(dict(unknown=None)), '?p=2&q=foo')
+
+    def test_remove_prefixes(self):
+        state = QueryState(QueryDict('is_staff__exact=1&is_active=1&p=2'))
+        self.assertEqual(state.query_string(remove=['is_staff']), '?is_active=1&p=2')
+        self.assertEqual(state.query_string(remove=['is_']), '?p=2')
+        self.assertEqual(
+            state.query_string(dict(is_staff__isnull='True'), remove=['is_staff']),
+            '?is_active=1&is_staff__isnull=True&p=2',
+        )
+
+    def test_query_strings_are_memoized(self):
+        state = QueryState(QueryDict('a=1'))
+        self.assertTrue(state.query_string(dict(b=2)) is state.query_string(dict(b=2)))
+        # unhashable values are not memoized
+        self.assertEqual(state.query_string(dict(b=[2])), state.query_string(dict(b=[2])))
+
+    def test_state_is_shared_by_the_request(self):
+        request = RequestFactory().get('/', dict(a=1))
+        self.assertTrue(QueryState.of(request) is QueryState.of(request))
+
+
+class UsersTestCase(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        for index in range(10):
+            User.objects.create(username='user%s' % index, is_staff=index % 2 == 0)
+
+
+class ExportTests(UsersTestCase):
+
+    def test_export_reaches_the_client_from_a_composite(self):
+        request = self.factory.get('/', {'export': 'csv', 'is_staff__exact': '1'})
+        response = UserPage.as_view()(request)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = ''.join(response).splitlines()
+        self.assertEqual(lines[0], 'username,is_staff')
+        usernames = [line.split(',')[0] for line in lines[1:]]
+        self.assertEqual(usernames, ['user0', 'user2', 'user4', 'user6', 'user8'])
+
+    def test_export_fetches_the_chunks_by_primary_key(self):
+        request = self.factory.get('/', {'export': 'jsonl'})
+        response = UserTable.as_view()(request)
+        # the primary keys then 4 chunks of at most 3 users
+        with self.assertNumQueries(5):
+            lines = ''.join(response).splitlines()
+        self.assertEqual(len(lines), 1 + 10)
+        self.assertEqual(lines[-1], '["user9", false]')
+
+
+class RelationPlanTests(UsersTestCase):
+
+    def test_many_to_many_fields_are_prefetched_and_rendered(self):
+        editors = Group.objects.create(name='editors')
+        readers = Group.objects.create(name='readers')
+        for user in User.objects.all():
+            user.groups.add(editors, readers)
+        table = UserTable(list_display=('username', 'groups'))
+        self.assertEqual(table.get_relation_plan(), RelationPlan((), ('groups',)))
+        table.request = self.factory.get('/')
+        # model count, page with its count and the groups of the page
+        with self.assertNumQueries(3):
+            rows = list(table.get_results()['objects'])
+        self.assertEqual(rows[0], ['user0', 'editors, readers'])
+
+
+class BatchColumnTests(UsersTestCase):
+
+    def setUp(self):
+        super(BatchColumnTests, self).setUp()
+        self.calls = list()
+
+        def shout(objects):
+            self.calls.append(len(objects))
+            return dict((user.pk, user.username.upper()) for user in objects
+                        if user.username != 'user9')
+        shout.batch = True
+        self.table = UserTable(list_display=('username', shout), list_per_page=4)
+
+    def test_called_once_per_page(self):
+        self.table.request = self.factory.get('/', {'p': '3'})
+        rows = list(self.table.get_results()['objects'])
+        self.assertEqual(self.calls, [2])
+        # not in the mapping
+        self.assertEqual(rows, [['user8', 'USER8'], ['user9', None]])
+
+    def test_called_once_per_export_chunk(self):
+        self.table.request = self.factory.get('/', {'export': 'jsonl'})
+        lines = ''.join(self.table.export('jsonl')).splitlines()
+        self.assertEqual(self.calls, [3, 3, 3, 1])
+        self.assertEqual(lines[1], '["user0", "USER0"]')
+        self.assertEqual(lines[-1], '["user9", null]')
+
+
+class WindowCountTests(UsersTestCase):
+
+    def setUp(self):
+        if not supports_window_count(connection):
+            self.skipTest('window functions are not supported')
+        super(WindowCountTests, self).setUp()
+
+    def paginate(self, page, q=None):
+        table = UserTable(list_per_page=3)
+        table.request = self.factory.get('/', {'p': page})
+        if q is None:
+            q = table._queryset()
+        return table.paginate(q)
+
+    def test_page_and_count_in_one_query(self):
+        with self.assertNumQueries(1):
+            page = self.paginate('2')
+            self.assertEqual(page.paginator.count, 10)
+        self.assertTrue('OVER ()' in connection.queries[-1]['sql'])
+        self.assertEqual(page.number, 2)
+        self.assertEqual([user.username for user in page], ['user3', 'user4', 'user5'])
+
+    def test_empty(self):
+        with self.assertNumQueries(1):
+            page = self.paginate('1', User.objects.filter(pk=0))
+            self.assertEqual(page.paginator.count, 0)
+        self.assertEqual(list(page), [])
+
+    def test_out_of_range_falls_back_to_the_last_page(self):
+        # the empty window query, the count then the last page
+        with self.assertNumQueries(3):
+            page = self.paginate('99')
+            self.assertEqual(page.paginator.count, 10)
+            self.assertEqual(page.number, 4)
+            self.assertEqual([user.username for user in page], ['user9'])
+
+    def test_distinct_querysets_are_counted_apart(self):
+        q = User.objects.distinct().order_by('username')
+        with self.assertNumQueries(2):
+            page = self.paginate('2', q)
+            self.assertEqual(page.paginator.count, 10)
+            self.assertEqual([user.username for user in page], ['user3', 'user4', 'user5'])
+        self.assertFalse('OVER ()' in connection.queries[-1]['sql'])
+
+
+class ResultsCacheTests(UsersTestCase):
+
+    def setUp(self):
+        super(ResultsCacheTests, self).setUp()
+        cache.clear()
+
+    def usernames(self, user=None, **initkwargs):
+        """Returns the count and the usernames of the second page"""
+        table = UserTable(results_cache_timeout=60, list_per_page=3, **initkwargs)
+        table.request = self.factory.get('/', {'p': '2'})
+        if user is not None:
+            table.request.user = user
+        results = table.get_results()
+        count = results['paginator'].paginator.count
+        return count, [row[0] for row in results['objects']]
+
+    def test_hit_fetches_the_page_by_primary_key(self):
+        # model count then the page with its count
+        with self.assertNumQueries(2):
+            self.assertEqual(self.usernames(), (10, ['user3', 'user4', 'user5']))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.usernames(), (10, ['user3', 'user4', 'user5']))
+        self.assertTrue(' IN (' in connection.queries[-1]['sql'])
+
+    def test_invalidated_when_the_model_changes(self):
+        self.usernames()
+        User.objects.get(username='user0').delete()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.usernames(), (9, ['user4', 'user5', 'user6']))
+        User.objects.create(username='user00')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.usernames(), (10, ['user3', 'user4', 'user5']))
+
+    def test_invalidated_when_a_dependency_changes(self):
+        self.usernames(results_cache_dependencies=(Group,))
+        with self.assertNumQueries(1):
+            self.usernames(results_cache_dependencies=(Group,))
+        Group.objects.create(name='editors')
+        with self.assertNumQueries(2):
+            self.usernames(results_cache_dependencies=(Group,))
+
+    def test_keys_are_scoped_by_user(self):
+        one, two = User.objects.all()[:2]
+        self.usernames(one)
+        with self.assertNumQueries(1):
+            self.usernames(one)
+        with self.assertNumQueries(2):
+            self.usernames(two)
+        with self.assertNumQueries(2):
+            self.usernames()
+
+
+class AggregatesTests(UsersTestCase):
+
+    def get_aggregates(self, **initkwargs):
+        table = UserTable(list_per_page=4, list_aggregates_page=True, **initkwargs)
+        table.request = self.factory.get('/')
+        return table.get_results()['aggregates']
+
+    def test_aggregates(self):
+        aggregates = self.get_aggregates(list_aggregates=dict(is_staff='sum'))
+        self.assertEqual(aggregates[0], None)
+        self.assertEqual(aggregates[1], dict(total=5, page=2))
+
+    def test_only_fields_can_be_aggregated(self):
+        def shout(user):
+            return user.username.upper()
+        self.assertRaises(
+            ImproperlyConfigured,
+            self.get_aggregates,
+            list_display=('username', shout),
+            list_aggregates={shout: 'max'},
+        )
+
+
+class DistinctStrategyTests(UsersTestCase):
+
+    def setUp(self):
+        super(DistinctStrategyTests, self).setUp()
+        editors = Group.objects.create(name='editors')
+        editing = Group.objects.create(name='editing')
+        for user in User.objects.filter(username__in=('user1', 'user2', 'user3')):
+            user.groups.add(editors, editing)
+        User.objects.get(username='user4').groups.add(editors)
+
+    def usernames(self, distinct_strategy):
+        filter = UserFilter(model_class=User, list_filter=('groups',))
+        table = UserTable(
+            filter=filter,
+            search_fields=('username', 'groups__name'),
+            distinct_strategy=distinct_strategy,
+        )
+        editors = Group.objects.get(name='editors')
+        table.request = self.factory.get('/', {'q': 'edit', 'groups__id__exact': editors.pk})
+        qs = table._queryset()
+        with self.assertNumQueries(1):
+            usernames = [user.username for user in qs]
+        return usernames, connection.queries[-1]['sql']
+
+    def test_subquery(self):
+        usernames, sql = self.usernames('subquery')
+        self.assertEqual(usernames, ['user1', 'user2', 'user3', 'user4'])
+        self.assertFalse('DISTINCT' in sql)
+        distinct_usernames, distinct_sql = self.usernames('distinct')
+        self.assertEqual(distinct_usernames, usernames)
+        self.assertTrue('DISTINCT' in distinct_sql)
+
+
+class FacetsTests(UsersTestCase):
+
+    def render_filter(self, params, queryset=None):
+        filter = UserFilter(model_class=User, show_facets=True)
+        UserTable(filter=filter, queryset=queryset)
+        response = filter(self.factory.get('/', params))
+        response.render()
+        return response.content
+
+    def test_facets_are_counted_over_the_search(self):
+        content = self.render_filter({'q': 'user1', 'is_staff__exact': '1'})
+        # the choice of the spec is not applied
+        self.assertTrue('All (1)' in content, content)
+        self.assertTrue('Yes (0)' in content, content)
+        self.assertTrue('No (1)' in content, content)
+
+    def test_facets_are_counted_over_the_table_queryset(self):
+        queryset = User.objects.exclude(username__in=('user0', 'user2'))
+        content = self.render_filter({'is_staff__exact': '0'}, queryset)
+        self.assertTrue('All (8)' in content, content)
+        self.assertTrue('Yes (3)' in content, content)
+        self.assertTrue('No (5)' in content, content)
+
+
+class SpecConstructionsTests(UsersTestCase):
+
+    def test_specs_are_built_once_per_request(self):
+        filter = UserFilter(model_class=User, list_filter=('is_staff', 'is_active'), show_facets=True)
+        table = UserChangeList(filter=filter)
+        request = self.factory.get('/', {'is_staff__exact': '1', 'q': 'user'})
+        # the table, rendered first, then the filter with its facets
+        for composite in (table, filter):
+            response = composite(request)
+            response.render()
+        self.assertTrue('Yes (5)' in response.content)
+        self.assertEqual(filter.spec_constructions, 2)
+        # again for the next request
+        filter(self.factory.get('/')).render()
+        self.assertEqual(filter.spec_constructions, 4)
+
+
+class PkListTests(UsersTestCase):
+
+    def setUp(self):
+        super(PkListTests, self).setUp()
+        cache.clear()
+
+    def get_pk_list(self, params=None, **initkwargs):
+        table = UserTable(**initkwargs)
+        table.request = self.factory.get('/', params or dict())
+        pks = table.get_pk_list()
+        return pks if pks is None else tuple(pks)
+
+    def usernames(self, pks):
+        users = User.objects.in_bulk(pks)
+        return [users[pk].username for pk in pks]
+
+    def test_disabled_by_default(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_pk_list(), None)
+
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            pks = self.get_pk_list(pk_list_cache_timeout=60)
+        self.assertEqual(self.usernames(pks), ['user%s' % index for index in range(10)])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_pk_list(pk_list_cache_timeout=60), pks)
+        # another search
+        with self.assertNumQueries(1):
+            pks = self.get_pk_list(dict(q='user1'), pk_list_cache_timeout=60)
+        self.assertEqual(self.usernames(pks), ['user1'])
+
+    def test_other_ordering_is_sorted_by_primary_key(self):
+        self.get_pk_list(pk_list_cache_timeout=60)
+        with self.assertNumQueries(1):
+            pks = self.get_pk_list(dict(o='-0'), pk_list_cache_timeout=60)
+        self.assertTrue(' IN (' in connection.queries[-1]['sql'])
+        self.assertEqual(self.usernames(pks), ['user%s' % index for index in range(9, -1, -1)])
+
+    def test_other_ordering_over_the_sort_cap(self):
+        self.get_pk_list(pk_list_cache_timeout=60, pk_list_sort_cap=5)
+        with self.assertNumQueries(1):
+            pks = self.get_pk_list(dict(o='-0'), pk_list_cache_timeout=60, pk_list_sort_cap=5)
+        self.assertFalse(' IN (' in connection.queries[-1]['sql'])
+        self.assertEqual(self.usernames(pks), ['user%s' % index for index in range(9, -1, -1)])
+
+    def test_oversize(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_pk_list(pk_list_cache_timeout=60, pk_list_max_size=5), None)
+        # it's remembered that the primary keys can't be cached
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_pk_list(pk_list_cache_timeout=60, pk_list_max_size=5), None)
+
+
+class ShowAllTests(UsersTestCase):
+
+    def test_uncounted_objects_are_fetched_once(self):
+        table = UserTable(count_results=False, show_all_chunk_size=3)
+        table.request = self.factory.get('/', {'all': ''})
+        with self.assertNumQueries(1):
+            results = table.get_results()
+            rows = list(results['objects'])
+        self.assertEqual(len(results['objects']), 10)
+        self.assertEqual(len(rows), 10)
+
+    def test_counted_objects_are_fetched_by_chunks(self):
+        table = UserTable(show_all_chunk_size=3)
+        table.request = self.factory.get('/', {'all': ''})
+        # model count, filtered count then 4 chunks
+        with self.assertNumQueries(6):
+            results = table.get_results()
+            rows = list(results['objects'])
+        self.assertEqual(len(rows), 10)
+
+
+class UserChangeList(ChangeList):
+
+    model_class = User
+    list_display = ('username', 'first_name')
+    list_editable = ('first_name',)
+    ordering = ('username',)
+    window_count = False
+
+
+class ChangeListTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        for index in range(25):
+            User.objects.create(username='user%02d' % index)
+
+    def test_queries_do_not_depend_on_the_page_size(self):
+        for size in (5, 20):
+            view = UserChangeList.as_view(list_per_page=size)
+            request = self.factory.get('/')
+            # model count, count, page and formset
+            with self.assertNumQueries(4):
+                response = view(request)
+                response.render()
+            self.assertEqual(response.content.count('name="form-'), 2 * size + 3)
+
+    def formset_data(self, first_name):
+        """Returns the data of the formset of the first page of 5 users"""
+        data = {
+            'form-TOTAL_FORMS': '5',
+            'form-INITIAL_FORMS': '5',
+            'form-MAX_NUM_FORMS': '',
+            '_save': 'Save',
+        }
+        for index, user in enumerate(User.objects.order_by('username')[:5]):
+            data['form-%s-id' % index] = str(user.pk)
+            data['form-%s-first_name' % index] = first_name
+        return data
+
+    def post(self, data):
+        request = self.factory.post('/', data)
+        request._messages = CookieStorage(request)
+        return request
+
+    def test_rows_without_form_are_read_only(self):
+        data = self.formset_data('John')
+        data['form-0-first_name'] = 'J' * 31
+        # the first page changes after the formset is submitted
+        User.objects.create(username='admin')
+        view = UserChangeList.as_view(list_per_page=5)
+        response = view(self.post(data))
+        response.render()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue('<td>admin</td>' in response.content)
+
+    def test_partial_save_reaches_the_client_from_a_composite(self):
+        user = User.objects.get(username='user03')
+        data = {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-MAX_NUM_FORMS': '',
+            'form-0-id': str(user.pk),
+            'form-0-first_name': 'John',
+            '_save_partial': '1',
+        }
+        view = UserPage.as_view(table_class=UserChangeList)
+        response = view(self.post(data))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), dict(saved=[str(user.pk)]))
+        self.assertEqual(User.objects.get(pk=user.pk).first_name, 'John')
+
+    def partial_save(self, **data):
+        defaults = {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-MAX_NUM_FORMS': '',
+            'form-0-first_name': 'John',
+            '_save_partial': '1',
+        }
+        defaults.update(data)
+        response = UserChangeList.as_view()(self.post(defaults))
+        return response.status_code, json.loads(response.content)
+
+    def test_partial_save_rejects_invalid_primary_keys(self):
+        status, data = self.partial_save(**{'form-0-id': 'abc'})
+        self.assertEqual(status, 400)
+        self.assertEqual(list(data['errors']), ['__all__'])
+        status, data = self.partial_save(**{'form-0-id': '999'})
+        self.assertEqual((status, data), (400, dict(errors={'__all__': ['Unknown object']})))
+        status, data = self.partial_save()
+        self.assertEqual((status, data), (400, dict(errors={'__all__': ['Unknown object']})))
+        self.assertFalse(User.objects.filter(first_name='John').exists())
+
+    def test_partial_save_rejects_too_many_forms(self):
+        user = User.objects.get(username='user03')
+        with self.assertNumQueries(0):
+            status, data = self.partial_save(**{
+                'form-TOTAL_FORMS': '1000000000',
+                'form-0-id': str(user.pk),
+            })
+        self.assertEqual((status, data), (400, dict(errors={'__all__': ['Too many forms']})))
+
+    def test_objects_are_saved_one_by_one_by_default(self):
+        view = UserChangeList.as_view(list_per_page=5, model_class=SavingUser)
+        view(self.post(self.formset_data('John')))
+        self.assertEqual(User.objects.filter(first_name='John', last_name='saved').count(), 5)
+
+    def test_bulk_save(self):
+        signals = list()
+
+        def receiver(signal, sender, instance, **kwargs):
+            signals.append((signal, instance.first_name))
+        pre_save.connect(receiver, sender=User)
+        post_save.connect(receiver, sender=User)
+        try:
+            view = UserChangeList.as_view(list_per_page=5, bulk_save=True)
+            view(self.post(self.formset_data('John')))
+        finally:
+            pre_save.disconnect(receiver, sender=User)
+            post_save.disconnect(receiver, sender=User)
+        self.assertEqual(User.objects.filter(first_name='John').count(), 5)
+        self.assertEqual(signals.count((pre_save, 'John')), 5)
+        self.assertEqual(signals.count((post_save, 'John')), 5)
+
+    def test_bulk_save_updates_the_fields_computed_by_pre_save(self):
+        for index in range(3):
+            Note.objects.create(text='note')
+        Note.objects.update(updated=datetime(2000, 1, 1))
+        data = {
+            'form-TOTAL_FORMS': '3',
+            'form-INITIAL_FORMS': '3',
+            'form-MAX_NUM_FORMS': '',
+            '_save': 'Save',
+        }
+        for index, note in enumerate(Note.objects.order_by('-pk')):
+            data['form-%s-id' % index] = str(note.pk)
+            data['form-%s-text' % index] = 'changed'
+        view = ChangeList.as_view(
+            model_class=Note,
+            list_display=('text',),
+            list_editable=('text',),
+            bulk_save=True,
+        )
+        view(self.post(data))
+        self.assertEqual(Note.objects.filter(text='changed').count(), 3)
+        self.assertFalse(Note.objects.filter(updated__year=2000).exists())
+
+    def test_bulk_save_calls_the_save_overrides(self):
+        view = UserChangeList.as_view(list_per_page=5, bulk_save=True, model_class=SavingUser)
+        view(self.post(self.formset_data('John')))
+        self.assertEqual(User.objects.filter(first_name='John', last_name='saved').count(), 5)
+
+
+class ActionsTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        for index in range(5):
+            User.objects.create(username='user%s' % index, first_name='John')
+
+    def test_select_across_control(self):
+        view = UserChangeList.as_view(actions=(delete_selected,))
+        response = view(self.factory.get('/'))
+        response.render()
+        self.assertTrue('<input type="checkbox" class="select-across" name="select_across" />' in response.content)
+        self.assertTrue('Apply to all 5 matching objects' in response.content)
+        table = UserChangeList(actions=(delete_selected,))
+        form = table.get_action_form(QueryDict('action=delete_selected&select_across=on'))
+        self.assertTrue(form.is_valid())
+        self.assertTrue(form.cleaned_data['select_across'])
+
+    def test_no_action_selected(self):
+        request = self.factory.post('/?p=1', {'action': '', 'index': '0'})
+        request._messages = CookieStorage(request)
+        response = UserChangeList.as_view(actions=(delete_selected,))(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/?p=1')
+        self.assertEqual([m.message for m in request._messages], ['No action selected.'])
+        self.assertEqual(User.objects.count(), 5)
+
+    def test_export_has_no_checkbox_column(self):
+        view = UserChangeList.as_view(actions=(delete_selected,))
+        response = view(self.factory.get('/', {'export': 'csv'}))
+        lines = ''.join(response).splitlines()
+        self.assertEqual(lines[0], 'username,first_name')
+        self.assertEqual(lines[1], 'user0,John')
+
+    def test_aggregates_are_under_their_column(self):
+        table = UserChangeList(
+            actions=(delete_selected,),
+            list_aggregates=dict(first_name='count_distinct'),
+        )
+        table.request = self.factory.get('/')
+        aggregates = table.get_aggregates(table._queryset(), None)
+        self.assertEqual(len(aggregates), len(list(table.headers())))
+        self.assertEqual(aggregates[0], None)
+        self.assertEqual(aggregates[2]['total'], 1)
+
+    def test_job_progress_reaches_the_client_from_a_composite(self):
+        job = Job(delete_selected, User.objects.all())
+        view = UserPage.as_view(table_class=UserChangeList)
+        response = view(self.factory.get('/', {'job': job.id}))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content)['status'], 'pending')
@@ -0,0 +1,62 @@
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from .. import filters
+from ..views.composites import Filter
+
+
+class CachedChoicesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Group.objects.create(name='editors')
+        Group.objects.create(name='readers')
+        User.objects.create(username='john', first_name='John')
+        User.objects.create(username='jane', first_name='Jane')
+
+    def choices(self, **initkwargs):
+        """Returns the choices of the specs by title"""
+        filter = Filter(
+            model_class=User,
+            list_filter=('groups', 'first_name'),
+            choices_cache_timeout=60,
+            **initkwargs
+        )
+        filter.request = RequestFactory().get('/')
+        specs = filter.get_filter_specs()
+        return dict((unicode(spec.title), sorted(choice['display'] for choice in spec.choices(filter)))
+                    for spec in specs)
+
+    def test_cached_filters_are_used(self):
+        filter = Filter(model_class=User, list_filter=('groups', 'first_name'))
+        filter.request = RequestFactory().get('/')
+        specs = filter.get_filter_specs()
+        self.assertFalse(isinstance(specs[0], filters.RelatedFieldListFilter))
+        filter.choices_cache_timeout = 60
+        filter.request = RequestFactory().get('/')
+        specs = filter.get_filter_specs()
+        self.assertTrue(isinstance(specs[0], filters.RelatedFieldListFilter))
+        self.assertTrue(isinstance(specs[1], filters.AllValuesFieldListFilter))
+
+    def test_choices_are_queried_once(self):
+        with self.assertNumQueries(2):
+            choices = self.choices()
+        self.assertEqual(choices['groups'], ['All', 'editors', 'readers'])
+        self.assertEqual(choices['first name'], ['All', 'Jane', 'John'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.choices(), choices)
+
+    def test_invalidated_when_the_related_model_changes(self):
+        self.choices()
+        Group.objects.create(name='writers')
+        # only the choices of the groups are queried again
+        with self.assertNumQueries(1):
+            choices = self.choices()
+        self.assertEqual(choices['groups'], ['All', 'editors', 'readers', 'writers'])
+        User.objects.create(username='joe', first_name='Joe')
+        with self.assertNumQueries(1):
+            choices = self.choices()
+        self.assertEqual(choices['first name'], ['All', 'Jane', 'Joe', 'John'])
@@ -0,0 +1,60 @@
+"""Import time of ``composite``, run ``python -m composite.tests.imports``
+with ``DJANGO_SETTINGS_MODULE`` set to print it."""
+import json
+import os
+import subprocess
+import sys
+
+from django.test import TestCase
+
+
+# modules imported by ``composite.views.composites``
+HEAVY_MODULES = (
+    'django.contrib.admin.util',
+    'django.contrib.admin.filters',
+    'django.contrib.admin.helpers',
+)
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+%s
+duration = time.time() - start
+print(json.dumps(dict(duration=duration, modules=list(sys.modules))))
+"""
+
+
+def measure(statement):
+    """Returns the seconds ``statement`` takes in a new interpreter and the
+    modules imported after it"""
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT % statement],
+        env=os.environ.copy(),
+    )
+    result = json.loads(output.splitlines()[-1])
+    return result['duration'], set(result['modules'])
+
+
+class LazyExportsTests(TestCase):
+
+    def test_base_views_do_not_import_the_admin(self):
+        duration, modules = measure('from composite import LeafCompositeView')
+        for module in HEAVY_MODULES:
+            self.assertFalse(module in modules, module)
+
+    def test_composites_are_imported_on_access(self):
+        duration, modules = measure('from composite import SortableTable')
+        for module in HEAVY_MODULES:
+            self.assertTrue(module in modules, module)
+
+    def test_unknown_attribute(self):
+        import composite
+        self.assertRaises(AttributeError, getattr, composite, 'Unknown')
+
+
+if __name__ == '__main__':
+    for statement in ('import composite',
+                      'from composite import LeafCompositeView',
+                      'from composite import SortableTable'):
+        duration, modules = measure(statement)
+        print('%-45s %6.1f ms %4d modules' % (statement, duration * 1000, len(modules)))
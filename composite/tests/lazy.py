@@ -0,0 +1,41 @@
+"""Views and collections used by ``composite.tests.routes`` with dotted
+paths, the module must only be imported when they are used"""
+from django.http import HttpResponse
+from django.views.generic import View
+
+from ..urls import UrlCollection
+
+
+class Hello(View):
+
+    word = 'hello'
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(' '.join([self.word] + [kwargs[key] for key in sorted(kwargs)]))
+
+
+def bye(request, word='bye'):
+    return HttpResponse(word)
+
+
+def echo(request, word, **kwargs):
+    return HttpResponse(word)
+
+
+class Articles(UrlCollection):
+
+    application_namespace = 'articles'
+
+    def __init__(self, **kwargs):
+        super(Articles, self).__init__(**kwargs)
+        self.add_url(r'^(?P<pk>\d+)/$', 'composite.tests.lazy.Hello', dict(word='article'), name='detail')
+        self.add_collection(r'^(?P<article>\d+)/comments/', 'composite.tests.lazy.Comments')
+
+
+class Comments(UrlCollection):
+
+    application_namespace = 'comments'
+
+    def __init__(self, **kwargs):
+        super(Comments, self).__init__(**kwargs)
+        self.add_url(r'^(?P<pk>\d+)/$', 'composite.tests.lazy.Hello', dict(word='comment'), name='detail')
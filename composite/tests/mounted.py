@@ -0,0 +1,7 @@
+"""Url configuration of ``composite.tests.urls`` with the urls of
+``composite.tests.routes`` under ``site/``"""
+from django.conf.urls import include
+from django.conf.urls import patterns
+
+
+urlpatterns = patterns('', (r'^site/', include('composite.tests.routes')))
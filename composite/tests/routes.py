@@ -0,0 +1,26 @@
+"""Url configuration of ``composite.tests.urls``"""
+from django.conf.urls import patterns
+from django.utils.functional import lazy
+from django.utils.translation import get_language
+
+from ..urls import UrlCollection
+
+
+def about():
+    """Regex that depends on the active language like a translated one"""
+    return r'^a-propos/$' if get_language() == 'fr' else r'^about/$'
+
+
+class Site(UrlCollection):
+
+    def __init__(self, **kwargs):
+        super(Site, self).__init__(**kwargs)
+        self.add_url(r'^hello/$', 'composite.tests.lazy.Hello', name='hello')
+        self.add_url(r'^bye/$', 'composite.tests.lazy.bye', dict(word='ciao'), name='bye')
+        self.add_collection(r'^articles/', 'composite.tests.lazy.Articles')
+        self.add_url(lazy(about, unicode)(), 'composite.tests.lazy.echo', dict(word='about'), name='about')
+        self.add_url(r'^archives?/$', 'composite.tests.lazy.echo', dict(word='archive'), name='archive')
+        self.add_url(r'(?P<word>\w+)/feed/$', 'composite.tests.lazy.echo', name='feed')
+
+
+urlpatterns = patterns('', (r'^', Site().include_urls()))
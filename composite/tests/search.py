@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.test import TransactionTestCase
+from django.test.client import RequestFactory
+
+from ..search import SQLiteFTS5SearchBackend
+from ..views.composites import SortableTable
+
+
+class SQLiteFTS5SearchBackendTests(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        self.backend = SQLiteFTS5SearchBackend(User, ('username', 'first_name'))
+        try:
+            self.backend.rebuild()
+        except DatabaseError:
+            self.skipTest('FTS5 is not available')
+
+        class Table(SortableTable):
+            model_class = User
+            list_display = ('username', 'first_name')
+            search_backend = self.backend
+        self.table = Table()
+
+    def tearDown(self):
+        uid = 'composite.search.%s' % self.backend.table_name
+        post_save.disconnect(sender=User, dispatch_uid=uid)
+        post_delete.disconnect(sender=User, dispatch_uid=uid)
+
+    def search(self, **params):
+        self.table.request = RequestFactory().get('/', params)
+        return [user.username for user in self.table._queryset()]
+
+    def test_index_follows_the_signals(self):
+        user = User.objects.create(username='fox', first_name='quick brown')
+        self.assertEqual(self.search(q='qui bro'), ['fox'])
+        user.delete()
+        self.assertEqual(self.search(q='quick'), [])
+
+    def test_operators_are_not_interpreted(self):
+        User.objects.create(username='fox', first_name='quick brown')
+        self.assertEqual(self.search(q='quick OR "'), [])
+
+    def test_best_matches_first(self):
+        User.objects.create(username='long', first_name='apple pie with a lot of cream')
+        User.objects.create(username='short', first_name='apple')
+        User.objects.create(username='none', first_name='pear')
+        # the table orders by descending primary key by default
+        self.assertEqual(self.search(q='apple'), ['short', 'long'])
+        # unless the user picks an ordering
+        self.assertEqual(self.search(q='apple', o='-0'), ['short', 'long'])
+        self.assertEqual(self.search(q='apple', o='0'), ['long', 'short'])
+        # exports read the ranked primary keys
+        self.table.request = RequestFactory().get('/', dict(q='apple'))
+        chunks = self.table.export_chunks()
+        self.assertEqual([user.username for chunk in chunks for user in chunk], ['short', 'long'])
+
+    def test_results_are_not_capped(self):
+        User.objects.bulk_create(
+            [User(username='user%s' % index, first_name='john') for index in range(1200)]
+        )
+        self.backend.rebuild()
+        self.table.request = RequestFactory().get('/', dict(q='john'))
+        self.assertEqual(self.table.filter_queryset().count(), 1200)
+
+    def test_index_is_joined_once(self):
+        for index in range(3):
+            User.objects.create(username='user%s' % index, first_name='john')
+        self.table.request = RequestFactory().get('/', dict(q='john'))
+        qs = self.table._queryset()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(qs)), 3)
+        sql = connection.queries[-1]['sql']
+        # no correlated subquery per row
+        self.assertEqual(sql.count('MATCH'), 1)
+        self.assertFalse('SELECT rowid' in sql)
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN %s' % qs.query.sql_with_params()[0],
+                       qs.query.sql_with_params()[1])
+        plan = ' '.join(unicode(row[-1]) for row in cursor.fetchall())
+        self.assertTrue('VIRTUAL TABLE' in plan, plan)
+        self.assertFalse('CORRELATED' in plan, plan)
+
+    def test_max_results(self):
+        User.objects.create(username='long', first_name='apple pie with a lot of cream')
+        User.objects.create(username='short', first_name='apple')
+        self.backend.max_results = 1
+        try:
+            self.assertEqual(self.search(q='apple'), ['short'])
+        finally:
+            self.backend.max_results = None
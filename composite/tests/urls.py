@@ -1,5 +1,138 @@
+import sys
+
+from django.conf import settings
+from django.core.urlresolvers import Resolver404
+from django.core.urlresolvers import clear_url_caches
+from django.core.urlresolvers import resolve
+from django.core.urlresolvers import reverse as django_reverse
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils import translation
+
+from ..urls import CollectionResolver
+from ..urls import LazyView
+from ..urls import RouteIndex
+from ..urls import is_class_path
+from ..urls import reverse
+from ..urls import static_segments
+from .routes import Site
+
+
+LAZY_MODULE = 'composite.tests.lazy'
+
+
+class StaticSegmentsTests(TestCase):
+
+    def test_segments(self):
+        self.assertEqual(static_segments(r'^articles/$'), ['articles'])
+        self.assertEqual(static_segments(r'^articles/edit/(?P<pk>\d+)/$'), ['articles', 'edit'])
+        self.assertEqual(static_segments(r'^articles/edit'), ['articles'])
+        self.assertEqual(static_segments(r'^$'), [])
+
+    def test_quantifiers(self):
+        self.assertEqual(static_segments(r'^articles/editx?/$'), ['articles'])
+        self.assertEqual(static_segments(r'^archives?/$'), [])
+        self.assertEqual(static_segments(r'^ab+/c/'), [])
+        self.assertEqual(static_segments(r'^a/b*/'), ['a'])
+        self.assertEqual(static_segments(r'^a/b{2}/'), ['a'])
+
+    def test_special_characters(self):
+        self.assertEqual(static_segments(r'^a/b\.c/'), ['a'])
+        self.assertEqual(static_segments(r'^a/[bc]/'), ['a'])
+        self.assertEqual(static_segments(r'^a/(?P<b>\w+)/'), ['a'])
+
+    def test_not_indexable(self):
+        self.assertEqual(static_segments(r'articles/'), [])
+        self.assertEqual(static_segments(r'^a/|^b/'), [])
 
 
 class CollectionTests(TestCase):
-    pass
+
+    urls = 'composite.tests.routes'
+
+    def test_class_path(self):
+        self.assertTrue(is_class_path('app.views.Index'))
+        self.assertFalse(is_class_path('app.views.index'))
+        self.assertFalse(is_class_path('app.views._Index'))
+
+    def test_resolve(self):
+        self.assertEqual(self.client.get('/hello/').content, 'hello')
+        self.assertEqual(self.client.get('/bye/').content, 'ciao')
+        self.assertEqual(self.client.get('/articles/3/').content, 'article 3')
+
+    def test_resolve_nested_collections(self):
+        self.assertEqual(self.client.get('/articles/3/comments/4/').content, 'comment 3 4')
+        match = resolve('/articles/3/comments/4/')
+        self.assertEqual(match.namespaces, ['articles', 'comments'])
+        self.assertEqual(match.url_name, 'detail')
+
+    def test_reverse(self):
+        self.assertEqual(reverse('hello'), '/hello/')
+        self.assertEqual(reverse('articles:detail', args=[3]), '/articles/3/')
+        self.assertEqual(reverse('articles:detail', kwargs=dict(pk=3)), '/articles/3/')
+        url = reverse('articles:comments:detail', kwargs=dict(article=3, pk=4))
+        self.assertEqual(url, '/articles/3/comments/4/')
+        # memoized
+        self.assertEqual(reverse('articles:detail', args=[3]), '/articles/3/')
+
+    def test_memoized_urls_follow_the_urlconf(self):
+        self.assertEqual(reverse('hello'), '/hello/')
+        # like the ``urls`` attribute of test cases
+        root_urlconf = settings.ROOT_URLCONF
+        settings.ROOT_URLCONF = 'composite.tests.mounted'
+        clear_url_caches()
+        try:
+            self.assertEqual(reverse('hello'), '/site/hello/')
+        finally:
+            settings.ROOT_URLCONF = root_urlconf
+            clear_url_caches()
+        self.assertEqual(reverse('hello'), '/hello/')
+
+    def test_reverse_view_function_by_path(self):
+        self.assertEqual(django_reverse('composite.tests.lazy.bye'), '/bye/')
+
+    def test_views_and_collections_are_imported_on_use(self):
+        sys.modules.pop(LAZY_MODULE, None)
+        index = Site().urlpatterns()[0]
+        collection = index.url_patterns[2]
+        self.assertTrue(isinstance(collection, CollectionResolver))
+        match = index.resolve('hello/')
+        self.assertTrue(isinstance(match.func, LazyView))
+        self.assertFalse(LAZY_MODULE in sys.modules)
+        response = match.func(RequestFactory().get('/hello/'))
+        self.assertEqual(response.content, 'hello')
+        self.assertTrue(LAZY_MODULE in sys.modules)
+        self.assertEqual(collection._collection, None)
+        self.assertEqual(index.resolve('articles/3/').kwargs, dict(pk='3'))
+        self.assertFalse(collection._collection is None)
+
+    def test_candidates(self):
+        index = Site().urlpatterns()[0]
+        self.assertTrue(isinstance(index, RouteIndex))
+        names = lambda path: [getattr(pattern, 'name', None) for pattern in index.candidates(path)]
+        # patterns with no static segment are always tried, in order
+        self.assertEqual(names('hello/'), ['hello', 'archive', 'feed'])
+        self.assertEqual(names('articles/3/'), [None, 'archive', 'feed'])
+        self.assertEqual(names('about/'), ['about', 'archive', 'feed'])
+        self.assertEqual(names('nothing/'), ['archive', 'feed'])
+
+    def test_resolve_patterns_with_quantifiers(self):
+        self.assertEqual(self.client.get('/archive/').content, 'archive')
+        self.assertEqual(self.client.get('/archives/').content, 'archive')
+
+    def test_resolve_unanchored_patterns(self):
+        self.assertEqual(self.client.get('/news/feed/').content, 'news')
+        self.assertEqual(resolve('/articles/3/sport/feed/').url_name, 'feed')
+
+    def test_not_found(self):
+        self.assertRaises(Resolver404, resolve, '/nothing/')
+        self.assertRaises(Resolver404, resolve, '/articles/x/')
+
+    def test_translated_patterns(self):
+        self.assertEqual(resolve('/about/').url_name, 'about')
+        self.assertEqual(reverse('about'), '/about/')
+        with translation.override('fr'):
+            self.assertEqual(resolve('/a-propos/').url_name, 'about')
+            self.assertRaises(Resolver404, resolve, '/about/')
+            self.assertEqual(reverse('about'), '/a-propos/')
+        self.assertEqual(resolve('/about/').url_name, 'about')
@@ -2,6 +2,7 @@ import os
 
 from django.test import TestCase
 from django.http import HttpRequest
+from django.http import HttpResponse
 from django.http import HttpResponseRedirect
 from django.views.generic import TemplateView
 
@@ -270,6 +271,37 @@ class StackedCompositeViewTests(TestCase):
         with self.settings(TEMPLATE_DIRS=(TEST_TEMPLATE_DIR,)):
             self.assertEqual(str(response), 'foo &amp; barspam &amp; egg\n')
 
+    def test_composite_get_forwards_responses_not_renderable(self):
+        """A response that can't be rendered in the template of the parent,
+        like a file, is sent to the client"""
+
+        class FixedResponseValue(LeafCompositeView):
+
+            response = None
+
+            def render_to_response(self, context, **response_kwargs):
+                return self.response
+
+        class FileComposite(LeafCompositeView):
+
+            def get(self, request, *args, **kwargs):
+                return HttpResponse('foo,bar\n', content_type='text/csv')
+
+        class TestComposite(StackedCompositeView):
+            template_name = 'stacked_composite.html'
+
+            composites = (
+                (FixedResponseValue, dict(response='foo & bar')),
+                FileComposite,
+            )
+
+        request = HttpRequest()
+        request.method = 'GET'
+        view = TestComposite.as_view()
+        response = view(request)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response.content, 'foo,bar\n')
+
 
 class StackedCompositeViewWithPostTests(TestCase):
 
@@ -1,6 +1,15 @@
+from django.conf import settings
 from django.conf.urls import include
 from django.conf.urls import patterns
 from django.conf.urls import url as django_url
+from django.core.exceptions import ImproperlyConfigured
+from django.core.urlresolvers import RegexURLResolver
+from django.core.urlresolvers import Resolver404
+from django.core.urlresolvers import get_script_prefix
+from django.core.urlresolvers import get_urlconf
+from django.core.urlresolvers import reverse as django_reverse
+from django.utils.importlib import import_module
+from django.utils.translation import get_language
 
 from collections import namedtuple
 
@@ -8,6 +17,232 @@ UrlInfo = namedtuple('UrlInfo', ('path', 'view', 'initkwargs', 'name'))
 CollectionInfo = namedtuple('CollectionInfo', ('path', 'collection_class', 'instance_namespace', 'initkwargs'))
 
 
+def import_by_path(dotted_path):
+    """Returns the object of ``dotted_path`` e.g. ``'app.views.Index'``"""
+    module_path, _, name = dotted_path.rpartition('.')
+    if not module_path:
+        raise ImproperlyConfigured('%r is not a dotted path' % dotted_path)
+    module = import_module(module_path)
+    try:
+        return getattr(module, name)
+    except AttributeError:
+        msg = 'Module %r has no attribute %r' % (module_path, name)
+        raise ImproperlyConfigured(msg)
+
+
+def is_class_path(dotted_path):
+    """Returns whether ``dotted_path`` names a class, it can't be known
+    without importing it so it relies on the naming conventions: class
+    names are capitalized"""
+    return dotted_path.rpartition('.')[2][:1].isupper()
+
+
+class LazyView(object):
+    """Class based view of the dotted path ``path`` imported on first
+    dispatch, it's ``as_view(**initkwargs)``.
+
+    Dotted paths of view functions are given as is to Django which imports
+    them lazily and can reverse them by their path. If ``path`` is a view
+    function anyway, it's called with ``initkwargs`` as extra keyword
+    arguments like Django does with the kwargs of an ``url``."""
+
+    def __init__(self, path, initkwargs):
+        self.path = path
+        self.initkwargs = initkwargs
+        self._view = None
+
+    def __repr__(self):
+        return '<LazyView %s>' % self.path
+
+    def view(self):
+        if self._view is None:
+            view = import_by_path(self.path)
+            if hasattr(view, 'as_view'):
+                self._view = view.as_view(**self.initkwargs)
+            else:
+                initkwargs = self.initkwargs
+
+                def function_view(request, *args, **kwargs):
+                    kwargs.update(initkwargs)
+                    return view(request, *args, **kwargs)
+                self._view = function_view
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view()(request, *args, **kwargs)
+
+
+class CollectionResolver(RegexURLResolver):
+    """Resolver of a collection added with ``UrlCollection.add_collection``,
+    the collection is instantiated, and imported if it's a dotted path,
+    the first time a request is dispatched to it or an url is reversed,
+    until then the collection costs nothing."""
+
+    def __init__(self, info):
+        self.info = info
+        self._collection = None
+        super(CollectionResolver, self).__init__(info.path, None)
+
+    def collection(self):
+        if self._collection is None:
+            collection_class = self.info.collection_class
+            if isinstance(collection_class, basestring):
+                collection_class = import_by_path(collection_class)
+            self._collection = collection_class(
+                instance_namespace=self.info.instance_namespace,
+                **self.info.initkwargs
+            )
+        return self._collection
+
+    # the following attributes are set by RegexURLResolver.__init__ but
+    # depend on the collection, the assignments are ignored
+
+    @property
+    def urlconf_module(self):
+        return self.collection().urlpatterns()
+
+    @property
+    def namespace(self):
+        return self.collection()._application_namespace
+
+    @namespace.setter
+    def namespace(self, value):
+        pass
+
+    @property
+    def app_name(self):
+        return self.collection().instance_namespace
+
+    @app_name.setter
+    def app_name(self, value):
+        pass
+
+
+# characters that end the static part of a regex
+REGEX_SPECIAL_CHARACTERS = '.^$*+?{}[]\\|()'
+
+
+def static_segments(regex):
+    r"""Returns the list of the path segments every path matched by
+    ``regex`` starts with, e.g. ``['articles', 'edit']`` for
+    ``^articles/edit/(?P<pk>\d+)/$``"""
+    if not regex.startswith('^') or '|' in regex:
+        return []
+    literal = list()
+    for char in regex[1:]:
+        if char in REGEX_SPECIAL_CHARACTERS:
+            if char in '*+?{' and literal:
+                # the previous character is not static
+                literal.pop()
+            break
+        literal.append(char)
+    return ''.join(literal).split('/')[:-1]
+
+
+class RouteNode(object):
+
+    def __init__(self):
+        self.children = dict()
+        # (position, pattern) of the patterns whose static segments lead
+        # to this node
+        self.patterns = list()
+
+
+class RouteIndex(RegexURLResolver):
+    """Resolver of ``url_patterns`` that only tries the patterns whose
+    static segments match the path, looked up in a prefix tree, instead of
+    every pattern in turn. It has no regex nor namespace so it's
+    transparent for ``reverse``."""
+
+    def __init__(self, url_patterns):
+        super(RouteIndex, self).__init__(r'^', url_patterns)
+        # trees by language since the regex of a pattern can be translated
+        self._trees = dict()
+
+    def tree(self):
+        language = get_language()
+        try:
+            return self._trees[language]
+        except KeyError:
+            pass
+        tree = RouteNode()
+        for position, pattern in enumerate(self.url_patterns):
+            node = tree
+            for segment in static_segments(pattern.regex.pattern):
+                node = node.children.setdefault(segment, RouteNode())
+            node.patterns.append((position, pattern))
+        self._trees[language] = tree
+        return tree
+
+    def candidates(self, path):
+        """Returns the patterns that can match ``path`` in order"""
+        node = self.tree()
+        candidates = list(node.patterns)
+        for segment in path.split('/')[:-1]:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            candidates.extend(node.patterns)
+        candidates.sort(key=lambda candidate: candidate[0])
+        return [pattern for position, pattern in candidates]
+
+    def resolve(self, path):
+        tried = []
+        for pattern in self.candidates(path):
+            try:
+                sub_match = pattern.resolve(path)
+            except Resolver404 as e:
+                sub_tried = e.args[0].get('tried')
+                if sub_tried is not None:
+                    tried.extend([[pattern] + t for t in sub_tried])
+                else:
+                    tried.append([pattern])
+            else:
+                if sub_match:
+                    return sub_match
+                tried.append([pattern])
+        raise Resolver404({'tried': tried, 'path': path})
+
+
+# urls memoized by ``reverse`` keyed by urlconf, script prefix, language,
+# namespace and current app
+REVERSE_TABLES = dict()
+# at most that many urls are memoized per namespace
+REVERSE_TABLE_SIZE = 1000
+
+
+def reverse(viewname, args=None, kwargs=None, current_app=None):
+    """Same as Django's ``reverse`` except the urls are memoized in a table
+    per namespace, use it to build links in composites"""
+    if isinstance(viewname, basestring):
+        namespace, _, name = viewname.rpartition(':')
+    else:
+        namespace, name = '', viewname
+    url_key = (name, tuple(args or ()), tuple(sorted((kwargs or dict()).items())))
+    try:
+        hash(url_key)
+    except TypeError:
+        return django_reverse(viewname, args=args, kwargs=kwargs, current_app=current_app)
+    urlconf = get_urlconf() or settings.ROOT_URLCONF
+    table_key = (urlconf, get_script_prefix(), get_language(), namespace, current_app)
+    table = REVERSE_TABLES.setdefault(table_key, dict())
+    try:
+        return table[url_key]
+    except KeyError:
+        pass
+    url = django_reverse(viewname, args=args, kwargs=kwargs, current_app=current_app)
+    if len(table) >= REVERSE_TABLE_SIZE:
+        table.clear()
+    table[url_key] = url
+    return url
+
+
+def clear_reverse_tables():
+    """Forgets the urls memoized by ``reverse``, needed if the url
+    patterns change at runtime"""
+    REVERSE_TABLES.clear()
+
+
 class UrlCollection(object):
 
     application_namespace = None
@@ -16,27 +251,43 @@ class UrlCollection(object):
         self.urls = list()
         self.instance_namespace = instance_namespace
         self._application_namespace = application_namespace if application_namespace else self.application_namespace
+        self._urlpatterns = None
 
     def add_url(self, path, view, initkwargs=None, name=None):
+        """``view`` can be a view, a class based view or the dotted path of
+        one of them which is imported the first time the url is used, the
+        dotted path of a class must end with a capitalized name"""
         initkwargs = initkwargs if initkwargs else dict()
         url = UrlInfo(path, view, initkwargs, name)
         self.urls.append(url)
 
     def add_collection(self, path, collection_class=None, instance_namespace=None, initkwargs=None):
+        """``collection_class`` can be a dotted path, in any case the
+        collection is only instantiated the first time it's used"""
         initkwargs = initkwargs if initkwargs else dict()
         url = CollectionInfo(path, collection_class, instance_namespace, initkwargs)
         self.urls.append(url)
 
-    def include_urls(self):
-        urls = list()
-        for url in self.urls:
-            if isinstance(url, UrlInfo):
-                if hasattr(url.view, 'as_view'):
-                    urls.append(django_url(url.path, url.view.as_view(**url.initkwargs), name=url.name))
+    def urlpatterns(self):
+        """Returns the url patterns of the collection, they are built once
+        and indexed by a ``RouteIndex``"""
+        if self._urlpatterns is None:
+            urls = list()
+            for url in self.urls:
+                if isinstance(url, UrlInfo):
+                    if isinstance(url.view, basestring) and is_class_path(url.view):
+                        urls.append(django_url(url.path, LazyView(url.view, url.initkwargs), name=url.name))
+                    elif isinstance(url.view, basestring):
+                        # Django imports it on first use
+                        urls.append(django_url(url.path, url.view, url.initkwargs, url.name))
+                    elif hasattr(url.view, 'as_view'):
+                        urls.append(django_url(url.path, url.view.as_view(**url.initkwargs), name=url.name))
+                    else:
+                        urls.append(django_url(url.path, url.view, url.initkwargs, url.name))
                 else:
-                    urls.append(django_url(url.path, url.view, url.initkwargs, url.name))
-            else:
-                collection = url.collection_class(instance_namespace=url.instance_namespace, **url.initkwargs)
-                include_urls = collection.include_urls()
-                urls.append((url.path, include_urls))
-        return include(patterns('', *urls), self._application_namespace, self.instance_namespace)
+                    urls.append(CollectionResolver(url))
+            self._urlpatterns = [RouteIndex(patterns('', *urls))]
+        return self._urlpatterns
+
+    def include_urls(self):
+        return include(self.urlpatterns(), self._application_namespace, self.instance_namespace)
@@ -39,11 +39,13 @@ Also you might need to mix both ``StackedCompositeView*`` and
 ``NamespacedCompositeView*``, the latter leading to similar code as the one
 you would get using *include template tags*.
 """
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse
 
 from django.views.generic import TemplateView
 from django.template.response import TemplateResponse
 
+from ..urls import reverse
+
 
 class RenderableTemplateResponseMixin(object):
     """Mixin that makes a TemplateResponse or one of its subclass
@@ -86,6 +88,14 @@ class RenderableTemplateResponse(RenderableTemplateResponseMixin, TemplateRespon
     pass
 
 
+def is_final_response(response):
+    """Returns whether ``response`` of a sub composite must be sent to the
+    client as is instead of being rendered in its parent, it's the case of
+    the responses that are not renderable like redirects, JSON or files"""
+    return (isinstance(response, HttpResponse)
+            and not isinstance(response, RenderableTemplateResponseMixin))
+
+
 class RenderableTemplateViewMixin(object):
     """This is a way to turn a ``TemplateView``-like into a leaf composite.
 
@@ -173,6 +183,11 @@ class LeafCompositeView(RenderableTemplateViewMixin, TemplateView):
             current = current.parent
         return current
 
+    def reverse(self, viewname, *args, **kwargs):
+        """Returns the url of ``viewname`` for ``args`` or ``kwargs``, urls
+        are memoized see ``composite.urls.reverse``"""
+        return reverse(viewname, args=args, kwargs=kwargs)
+
 
 class AbstractCompositeView(LeafCompositeView):
     """Abstract class you have to subclass to create a composite class
@@ -182,9 +197,11 @@ class AbstractCompositeView(LeafCompositeView):
 
     def composites_responses(self, request, *args, **kwargs):
         """Must return a map-like object with the responses of the sub
-        composites or an ``HttpResponseRedirect``.
+        composites or the response of a sub composite that must be sent to
+        the client, like an ``HttpResponseRedirect``, see
+        ``is_final_response``.
 
-        If this method doesn't return ``HttpResponseRedirect`` it is assumed
+        If this method doesn't return an ``HttpResponse`` it is assumed
         that the template can be rendered with the map-like object of
         responses as values. Regarding the responses, the convention is to be
         able to render them with the template render syntax ``{{ composite }}``
@@ -195,12 +212,13 @@ class AbstractCompositeView(LeafCompositeView):
 
     def get(self, request, *args, **kwargs):
         """Retrieve the context, retrieve the responses from subcomposites
-        if one of them is a redirect it's returned else all the responses
-        are added to the context of template and the template rendered.
+        if one of them is a redirect or another response that can't be
+        rendered it's returned else all the responses are added to the
+        context of template and the template rendered.
         """
         context = self.get_context_data(**kwargs)
         responses = self.composites_responses(request, *args, **kwargs)
-        if isinstance(responses, HttpResponseRedirect):
+        if isinstance(responses, HttpResponse):
             return responses
         else:
             context.update(responses)
@@ -353,6 +371,8 @@ class StackedCompositeView(AbstractCompositeView):
         responses = list()
         for composite in self._composites(request, *args, **kwargs):
             response = composite(request, *args, **kwargs)
+            if is_final_response(response):
+                return response
             responses.append(response)
         context = dict(composites=responses)
         return context
@@ -387,11 +407,10 @@ class StackedCompositeViewWithPost(StackedCompositeView, CompositeHierarchyHasPo
                 request.method = 'GET'
                 switched_method = True
             response = composite(request, *args, **kwargs)
-            if (request.method == 'POST'
-                and isinstance(response, HttpResponseRedirect)):
-                return response
             if switched_method:
                 request.method = 'POST'
+            if is_final_response(response):
+                return response
             responses.append(response)
         context = dict(composites=responses)
         return context
@@ -474,6 +493,8 @@ class NamespacedCompositeView(AbstractCompositeView):
         responses = dict()
         for name, composite in self._composites(request, *args, **kwargs):
             response = composite(request, *args, **kwargs)
+            if is_final_response(response):
+                return response
             responses[name] = response
         return responses
 
@@ -507,10 +528,9 @@ class NamespacedCompositeViewWithPost(NamespacedCompositeView, CompositeHierarch
                 request.method = 'GET'
                 switched_method = True
             response = composite(request, *args, **kwargs)
-            if (request.method == 'POST'
-                and isinstance(response, HttpResponseRedirect)):
-                return response
             if switched_method:
                 request.method = 'POST'
+            if is_final_response(response):
+                return response
             responses[name] = response
         return responses
@@ -1,23 +1,54 @@
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+import csv
+import json
+import logging
+from collections import namedtuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, Page, EmptyPage, PageNotAnInteger
 from django.contrib.admin.util import get_fields_from_path
 from django.contrib.admin.util import lookup_needs_distinct
-from django.contrib.admin.filters import FieldListFilter
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from django.contrib.admin.helpers import ActionForm
 from django.contrib.admin.helpers import checkbox
+from django.forms import CheckboxInput
 from django.forms.models import modelformset_factory
 from django.forms.models import modelform_factory
 from django.utils.datastructures import SortedDict
 from django.utils.translation import ugettext_lazy
+from django.utils.translation import ugettext as _
 from django.utils.translation import ungettext
 from django.utils.safestring import mark_safe
+from django.utils.html import escape
 from django.utils.encoding import force_text
 from django.utils.http import urlencode
+from django.http import HttpResponse
+from django.http import Http404
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.db import connections
+from django.db import transaction
+from django.db import router
 from django.db import models
 
 from base import StackedCompositeView
 from .base import LeafCompositeView
+from .. import cache
+from .. import filters
+from ..actions import Job
+from ..cache import model_label
+from ..search import IContainsSearchBackend
+from ..utils import OrderedSet
+
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:  # Django < 1.5, HttpResponse consumes iterators lazily
+    from django.http import HttpResponse as StreamingHttpResponse
+
+
+logger = logging.getLogger(__name__)
 
 # Changelist settings
 ALL_VAR = 'all'
@@ -28,35 +59,213 @@ SEARCH_VAR = 'q'
 TO_FIELD_VAR = 't'
 IS_POPUP_VAR = 'pop'
 ERROR_FLAG = 'e'
+EXPORT_VAR = 'export'
+JOB_VAR = 'job'
+PARTIAL_SAVE_VAR = '_save_partial'
 
 IGNORED_PARAMS = (
-    ALL_VAR, ORDER_VAR, ORDER_TYPE_VAR, SEARCH_VAR, IS_POPUP_VAR, TO_FIELD_VAR)
+    ALL_VAR, ORDER_VAR, ORDER_TYPE_VAR, SEARCH_VAR, IS_POPUP_VAR, TO_FIELD_VAR,
+    EXPORT_VAR, JOB_VAR)
+
+# parameters that don't change which objects match the request
+PK_LIST_IGNORED_PARAMS = (
+    ALL_VAR, ORDER_VAR, ORDER_TYPE_VAR, PAGE_VAR, EXPORT_VAR, JOB_VAR)
 
 # Text to display within change-list table cells if the value is blank.
 EMPTY_CHANGELIST_VALUE = ugettext_lazy('(None)')
 
 
-class RequestOperationsMixin(object):
+class QueryState(object):
+    """Parameters of the query string of a request, parsed once, that
+    builds the query strings derived from it.
 
-    # FIXME: move this into a function
+    Parameters are sorted so that the same parameters always give the same
+    query string and derived query strings are memoized, since the state
+    never changes.
+    """
 
-    def get_query_string(self, new_params=None, remove=None):
-        if new_params is None:
-            new_params = dict()
-        if remove is None:
-            remove = list()
-        params = dict(self.request.GET.items())
-        for r in remove:
-            for k in list(params):
-                if k.startswith(r):
-                    del params[k]
-        for k, v in new_params.items():
+    def __init__(self, query_dict):
+        self.params = tuple(sorted(query_dict.items()))
+        self._query_strings = dict()
+
+    def query_string(self, new_params=None, remove=None):
+        """Returns the query string with the parameters starting with one of
+        ``remove`` removed and ``new_params`` set, ``None`` values remove
+        the parameter"""
+        new_params = tuple(sorted((new_params or dict()).items()))
+        remove = tuple(remove or ())
+        try:
+            return self._query_strings[(new_params, remove)]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable value, don't memoize
+            return self._query_string(new_params, remove)
+        query_string = self._query_string(new_params, remove)
+        self._query_strings[(new_params, remove)] = query_string
+        return query_string
+
+    def _query_string(self, new_params, remove):
+        params = dict(
+            (k, v) for k, v in self.params
+            if not any(k.startswith(r) for r in remove)
+        )
+        for k, v in new_params:
             if v is None:
-                if k in params:
-                    del params[k]
+                params.pop(k, None)
             else:
                 params[k] = v
-        return '?%s' % urlencode(params)
+        return '?%s' % urlencode(sorted(params.items()))
+
+    @classmethod
+    def of(cls, request):
+        """Returns the state of ``request``, it's shared by every composite
+        of the request"""
+        try:
+            return request._composite_query_state
+        except AttributeError:
+            request._composite_query_state = cls(request.GET)
+            return request._composite_query_state
+
+
+class RequestOperationsMixin(object):
+
+    def get_query_string(self, new_params=None, remove=None):
+        return QueryState.of(self.request).query_string(new_params, remove)
+
+
+RelationPlan = namedtuple('RelationPlan', ('select_related', 'prefetch_related'))
+
+
+# name of the attribute holding the count when using window_count
+WINDOW_COUNT_ATTRIBUTE = 'composite_window_count'
+
+
+def supports_window_count(connection):
+    """Returns whether ``COUNT(*) OVER ()`` is supported by the database
+    behind ``connection``"""
+    if connection.vendor in ('postgresql', 'oracle'):
+        return True
+    if connection.vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= (3, 25, 0)
+    return False
+
+
+# aggregate functions that can be used in ``SortableTable.list_aggregates``
+AGGREGATES = dict(
+    sum=models.Sum,
+    avg=models.Avg,
+    min=models.Min,
+    max=models.Max,
+    count_distinct=lambda name: models.Count(name, distinct=True),
+)
+
+
+# form and formset classes built by ``ChangeList`` keyed by kind, ChangeList
+# class and configuration
+FORM_CLASSES = dict()
+
+
+class UncountedPage(object):
+    """Page of objects of a ``SortableTable`` with ``count_results`` set to
+    ``False``, it has the same interface as ``django.core.paginator.Page``
+    except there is no ``paginator``, hence no count nor last page"""
+
+    paginator = None
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Page %s>' % self.number
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def chunked(q, size):
+    """Generator over lists of at most ``size`` objects of ``q``, it does
+    a query per list, if ``size`` is ``None`` every object is fetched at
+    once"""
+    if size is None:
+        yield list(q)
+        return
+    start = 0
+    while True:
+        # evaluate the slice as a list so that prefetch_related applies
+        chunk = list(q[start:start + size])
+        if chunk:
+            yield chunk
+        if len(chunk) < size:
+            break
+        start += size
+
+
+class LazyRows(object):
+    """Rows of ``table`` for the objects of ``q`` computed while they are
+    iterated, so that only the cells of the current row are alive and if
+    ``chunk_size`` is not ``None`` only ``chunk_size`` objects.
+
+    ``length`` must be the number of objects of ``q``, it's what ``len``
+    returns, which prevents the ``for`` template tag from turning the rows
+    into a list. The rows can be iterated several times, each time they
+    are computed again.
+    """
+
+    def __init__(self, table, q, length, chunk_size=None):
+        self.table = table
+        self.q = q
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for chunk in chunked(self.q, self.chunk_size):
+            for row in self.table.items(chunk):
+                yield row
+
+
+def json_response(data, status=200):
+    response = HttpResponse(json.dumps(data), content_type='application/json')
+    response.status_code = status
+    return response
+
+
+# values exported as is in JSON Lines, others are converted to text
+JSON_TYPES = (type(None), bool, int, long, float, basestring)
+
+
+class Echo(object):
+    """File-like object that returns what is written to it, used to
+    stream the lines produced by ``csv.writer``"""
+
+    def write(self, value):
+        return value
 
 
 class SortableTable(LeafCompositeView, RequestOperationsMixin):
@@ -66,17 +275,76 @@ class SortableTable(LeafCompositeView, RequestOperationsMixin):
     list_max_show_all = 100
     list_display = (unicode,)
     ordering = ()
+    # relations to always follow with select_related, True to follow every
+    # non null foreign key, see ``get_relation_plan``
     list_select_related = ()
     search_fields = ()
+    # see ``composite.search``
+    search_backend = IContainsSearchBackend()
+    # how duplicates are removed when the filters or the search follow a
+    # multi-valued relation: 'subquery' filters the objects with a
+    # ``pk__in`` subquery, 'distinct' uses ``SELECT DISTINCT``
+    distinct_strategy = 'subquery'
+
+    # maps names of model fields in ``list_display`` to an aggregate function
+    # name from ``AGGREGATES`` or a callable returning an aggregate given the
+    # name, aggregates are rendered in the table footer
+    list_aggregates = dict()
+    # also render the aggregates over the objects of the current page
+    list_aggregates_page = False
+
+    # when False the objects are never counted, pages only know whether
+    # there is a next page
+    count_results = True
+    # fetch the count along with the objects of the page, None to use it
+    # when the database supports window functions
+    window_count = None
+
+    # seconds the counts and the objects of a page are cached, None disables
+    # the cache, the entries are invalidated when the model or one of
+    # ``results_cache_dependencies`` changes
+    results_cache_timeout = None
+    results_cache_dependencies = ()
+
+    # seconds the ordered primary keys of the objects matching the filters
+    # and the search are cached, None disables it, pages and exports then
+    # fetch their objects by primary key instead of filtering again, it's
+    # invalidated like the results cache
+    pk_list_cache_timeout = None
+    # results with more objects are not cached
+    pk_list_max_size = 100000
+    # primary keys cached for another ordering are sorted again with one
+    # ``pk__in`` query when there are at most that many of them
+    pk_list_sort_cap = 500
+
+    # number of rows fetched per query while rendering all the objects with
+    # ``ALL_VAR``, None to fetch them all at once
+    show_all_chunk_size = 100
+
+    # formats accepted by ``EXPORT_VAR``, set to ``()`` to disable exports
+    export_formats = ('csv', 'jsonl')
+    # number of rows fetched per query while exporting, it's the size of
+    # a ``pk__in`` lookup so keep it below the 999 parameters of SQLite
+    export_chunk_size = 500
+
+    model_class = None
+    queryset = None
+    filter = None
+
+    # objects rendered for the current request, set by ``get_results``
+    page_objects = None
 
     def __init__(
             self,
             **kwargs
         ):
-        self.model_class = kwargs.pop('model_class')
-        self.queryset = kwargs.pop('queryset', None)
-        self.filter = kwargs.pop('filter', None)
+        self.model_class = kwargs.pop('model_class', self.model_class)
+        self.queryset = kwargs.pop('queryset', self.queryset)
+        self.filter = kwargs.pop('filter', self.filter)
         super(SortableTable, self).__init__(**kwargs)
+        if self.filter is not None:
+            # the facets of the filter are counted over the table
+            self.filter.table = self
 
     def get_ordering(self):
         params = dict(self.request.GET.items())
@@ -108,97 +376,433 @@ class SortableTable(LeafCompositeView, RequestOperationsMixin):
 
         return ordering
 
-    def _queryset(self):
-        (filter_specs, has_filters, use_distinct) = self.filter.get_filters()
-
-        # Then, we let every list filter modify the queryset to its liking.
+    def get_base_queryset(self):
+        """Returns the queryset of the table before it's filtered"""
         if self.queryset:
-            qs = self.queryset
+            return self.queryset
+        return self.model_class.objects.all()
+
+    def filter_queryset(self, exclude_spec=None):
+        """Returns the base queryset filtered by the filter specs and the
+        search, without ordering, ``exclude_spec`` is not applied, it's
+        used to count the facets of a spec"""
+        if self.filter:
+            # the filter composite may be rendered after the table or not at
+            # all, e.g. for an export
+            self.filter.request = self.request
+            (filter_specs, has_filters, use_distinct) = self.filter.get_filters()
         else:
-            qs = self.model_class.objects.all()
+            (filter_specs, has_filters, use_distinct) = ([], False, False)
+
+        # Then, we let every list filter modify the queryset to its liking.
+        base = self.get_base_queryset()
+        qs = base
         for filter_spec in filter_specs:
+            if filter_spec is exclude_spec:
+                continue
             new_qs = filter_spec.queryset(self.request, qs)
             if new_qs is not None:
                 qs = new_qs
 
-        # Use select_related() if one of the list_display options is a field
-        # with a relationship and the provided queryset doesn't already have
-        # select_related defined.
+        # Apply keyword searches.
+        search_query = self.request.GET.get(SEARCH_VAR, '')
+        if search_query:
+            qs, search_use_distinct = self.search_backend.search(self, qs, search_query)
+            use_distinct = use_distinct or search_use_distinct
+
+        # Remove the duplicates introduced by multi-valued relations.
+        if use_distinct:
+            if self.distinct_strategy == 'subquery':
+                qs = base.filter(pk__in=qs.order_by().values('pk'))
+            else:
+                qs = qs.distinct()
+        return qs
+
+    def prepare_queryset(self, qs):
+        """Returns ``qs`` ordered and following the relations needed to
+        render the rows"""
+        # Follow the relations required to render list_display unless the
+        # provided queryset already does.
+        plan = self.get_relation_plan()
+        logger.debug('%s relation plan: %s', self.__class__.__name__, plan)
         if not qs.query.select_related:
-            if self.list_select_related:
+            if plan.select_related is True:
                 qs = qs.select_related()
-            else:
-                for field_name in self.list_display:
-                    try:
-                        field = self.model_class._meta.get_field(field_name)
-                    except models.FieldDoesNotExist:
-                        pass
-                    else:
-                        if isinstance(field.rel, models.ManyToOneRel):
-                            qs = qs.select_related()
-                            break
+            elif plan.select_related:
+                qs = qs.select_related(*plan.select_related)
+        if plan.prefetch_related:
+            qs = qs.prefetch_related(*plan.prefetch_related)
 
         # Set ordering.
-        ordering = self.get_ordering()
-        qs = qs.order_by(*ordering)
+        return self.order_queryset(qs, self.get_ordering())
 
-        # Apply keyword searches.
-        def construct_search(field_name):
-            if field_name.startswith('^'):
-                return "%s__istartswith" % field_name[1:]
-            elif field_name.startswith('='):
-                return "%s__iexact" % field_name[1:]
-            elif field_name.startswith('@'):
-                return "%s__search" % field_name[1:]
+    def order_queryset(self, qs, ordering):
+        """Returns ``qs`` ordered by ``ordering``, when the user searched
+        without picking an ordering the search backend may rank the
+        objects first"""
+        search_query = self.request.GET.get(SEARCH_VAR, '')
+        if search_query and ORDER_VAR not in self.request.GET:
+            qs, ordering = self.search_backend.rank(self, qs, search_query, ordering)
+        return qs.order_by(*ordering)
+
+    def iter_ordered_pks(self, qs, limit=None):
+        """Generator over the primary keys of the ordered queryset ``qs``,
+        at most ``limit`` of them, they are read without a result cache"""
+        # the extra selects ``qs`` is ordered by, like the rank of the
+        # search, must stay in the selected columns
+        extra = [name.lstrip('-') for name in qs.query.order_by
+                 if name.lstrip('-') in qs.query.extra]
+        rows = qs.values_list('pk', *extra)
+        if limit is not None:
+            rows = rows[:limit]
+        for row in rows.iterator():
+            yield row[0]
+
+    def ordered_pks(self, qs, limit=None):
+        """Returns the list of the primary keys of the ordered queryset
+        ``qs``, at most ``limit`` of them"""
+        return list(self.iter_ordered_pks(qs, limit))
+
+    def _queryset(self):
+        return self.prepare_queryset(self.filter_queryset())
+
+    def get_relation_plan(self):
+        """Returns the ``RelationPlan`` of the relations to follow to render
+        ``list_display`` without a query per row.
+
+        - foreign keys in ``list_display`` are added to ``select_related``
+        - many to many fields in ``list_display`` are added to
+          ``prefetch_related``, they are rendered as the comma separated
+          list of the related objects
+        - callables and model attributes can declare the relations they use
+          with ``select_related`` and ``prefetch_related`` attributes
+        - ``list_select_related`` is added to ``select_related``, if it is
+          ``True`` every non null foreign key is followed.
+        """
+        if self.list_select_related is True:
+            select_related = True
+        else:
+            select_related = OrderedSet(self.list_select_related)
+        prefetch_related = OrderedSet()
+        for item in self.list_display:
+            if item is unicode:
+                continue
+            elif callable(item):
+                attr = item
             else:
-                return "%s__icontains" % field_name
+                try:
+                    field = self.model_class._meta.get_field(item)
+                except models.FieldDoesNotExist:
+                    attr = getattr(self.model_class, item, None)
+                else:
+                    if isinstance(field, models.ManyToManyField):
+                        prefetch_related.add(item)
+                    elif select_related is not True and isinstance(field.rel, models.ManyToOneRel):
+                        select_related.add(item)
+                    continue
+            if select_related is not True:
+                select_related |= getattr(attr, 'select_related', ())
+            prefetch_related |= getattr(attr, 'prefetch_related', ())
+        if select_related is not True:
+            select_related = tuple(select_related)
+        return RelationPlan(select_related, tuple(prefetch_related))
 
-        search_query = self.request.GET.get(SEARCH_VAR, '')
-        if self.search_fields and search_query:
-            orm_lookups = [construct_search(str(search_field))
-                           for search_field in self.search_fields]
-            for bit in self.query.split():
-                or_queries = [models.Q(**{orm_lookup: bit})
-                              for orm_lookup in orm_lookups]
-                qs = qs.filter(reduce(operator.or_, or_queries))
-            if not use_distinct:
-                for search_spec in orm_lookups:
-                    if lookup_needs_distinct(self.lookup_opts, search_spec):
-                        use_distinct = True
-                        break
+    def get_page(self, paginator):
+        """Returns the page of ``paginator`` requested with ``PAGE_VAR``"""
+        page = self.request.GET.get(PAGE_VAR)
+        try:
+            return paginator.page(page)
+        except PageNotAnInteger:
+            # If page is not an integer, deliver first page.
+            return paginator.page(1)
+        except EmptyPage:
+            # If page is out of range (e.g. 9999),
+            # deliver last page of results.
+            return paginator.page(paginator.num_pages)
 
-        if use_distinct:
-            return qs.distinct()
+    def get_page_number(self):
+        """Returns the page number requested with ``PAGE_VAR``, invalid
+        numbers are replaced by the first page"""
+        try:
+            number = int(self.request.GET.get(PAGE_VAR, 1))
+        except ValueError:
+            return 1
+        return max(number, 1)
+
+    def get_uncounted_page(self, q):
+        """Returns the ``UncountedPage`` of ``q`` requested with
+        ``PAGE_VAR``, one more object than ``list_per_page`` is fetched to
+        know whether there is a next page"""
+        number = self.get_page_number()
+        bottom = (number - 1) * self.list_per_page
+        objects = list(q[bottom:bottom + self.list_per_page + 1])
+        has_next = len(objects) > self.list_per_page
+        return UncountedPage(objects[:self.list_per_page], number, has_next)
+
+    def get_full_result_count(self):
+        """Returns the count of objects of the model or ``None`` if
+        ``count_results`` is not set"""
+        if self.count_results:
+            return self.model_class.objects.count()
+        return None
+
+    def get_page_urls(self, page):
+        """Returns the urls of the previous and next pages of ``page``"""
+        urls = dict(previous_page_url=None, next_page_url=None)
+        if hasattr(page, 'has_previous') and page.has_previous():
+            urls['previous_page_url'] = self.get_query_string({PAGE_VAR: page.previous_page_number()})
+        if hasattr(page, 'has_next') and page.has_next():
+            urls['next_page_url'] = self.get_query_string({PAGE_VAR: page.next_page_number()})
+        return urls
+
+    def use_window_count(self, q):
+        """Returns whether the page of ``q`` can be fetched along with
+        the count of ``q`` in a single query"""
+        if self.window_count is not None:
+            return self.window_count
+        # the window is computed before DISTINCT is applied
+        if q.query.distinct:
+            return False
+        return supports_window_count(connections[q.db])
+
+    def paginate(self, q):
+        """Returns the page of ``q`` requested with ``PAGE_VAR``.
+
+        If the database supports it the objects of the page and the count are
+        fetched with a single query, annotating each row with
+        ``COUNT(*) OVER ()``, otherwise or if the page is out of range
+        ``Paginator`` does a ``COUNT`` query followed by the page query.
+        """
+        if not self.count_results:
+            return self.get_uncounted_page(q)
+        paginator = Paginator(q, self.list_per_page)
+        if not self.use_window_count(q):
+            return self.get_page(paginator)
+        number = self.get_page_number()
+        bottom = (number - 1) * self.list_per_page
+        qs = q.extra(select={WINDOW_COUNT_ATTRIBUTE: 'COUNT(*) OVER ()'})
+        objects = list(qs[bottom:bottom + self.list_per_page])
+        if objects:
+            paginator._count = getattr(objects[0], WINDOW_COUNT_ATTRIBUTE)
+        elif number == 1:
+            paginator._count = 0
+        else:
+            # out of range, let the paginator find the last page
+            return self.get_page(paginator)
+        return Page(objects, number, paginator)
+
+    def get_results_cache_scope(self):
+        """Returns what, besides the query string, changes the results for
+        the current request, by default the user"""
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated():
+            return user.pk
+        return None
+
+    def get_results_cache_key(self):
+        params = sorted(
+            (key, values) for key, values in self.request.GET.lists()
+            if key != EXPORT_VAR
+        )
+        models = (self.model_class,) + tuple(self.results_cache_dependencies)
+        return cache.make_key(
+            'results',
+            models,
+            self.__class__.__module__,
+            self.__class__.__name__,
+            model_label(self.model_class),
+            self.list_per_page,
+            params,
+            self.get_results_cache_scope(),
+        )
+
+    def get_cached_page(self, q):
+        """Returns the full result count and the current page of ``q``,
+        the counts and the primary keys of the objects of the page are
+        cached for ``results_cache_timeout`` seconds"""
+        key = self.get_results_cache_key()
+        cached = cache.cache.get(key)
+        if cached is None:
+            full_result_count = self.get_full_result_count()
+            page = self.paginate(q)
+            count = page.paginator.count if page.paginator else None
+            pks = [object.pk for object in page.object_list]
+            cached = (full_result_count, count, page.number, page.has_next(), pks)
+            cache.cache.set(key, cached, self.results_cache_timeout)
         else:
-            return qs
+            full_result_count, count, number, has_next, pks = cached
+            objects = dict((object.pk, object) for object in q.filter(pk__in=pks))
+            objects = [objects[pk] for pk in pks if pk in objects]
+            if count is None:
+                page = UncountedPage(objects, number, has_next)
+            else:
+                paginator = Paginator(q, self.list_per_page)
+                paginator._count = count
+                page = Page(objects, number, paginator)
+        return full_result_count, page
+
+    def get_pk_list_key(self, ordering):
+        params = sorted(
+            (key, values) for key, values in self.request.GET.lists()
+            if key not in PK_LIST_IGNORED_PARAMS
+        )
+        models = (self.model_class,) + tuple(self.results_cache_dependencies)
+        return cache.make_key(
+            'pks',
+            models,
+            self.__class__.__module__,
+            self.__class__.__name__,
+            model_label(self.model_class),
+            params,
+            ordering,
+            self.get_results_cache_scope(),
+        )
+
+    def get_pk_list(self):
+        """Returns the primary keys of the objects matching the current
+        filters and search in the requested order as a
+        ``composite.cache.PackedPks``, or ``None`` if they are
+        not cached because ``pk_list_cache_timeout`` is not set, there is
+        more than ``pk_list_max_size`` of them or they are not integers.
+
+        The primary keys are cached packed in a string, for the
+        requested ordering and for any ordering so that a sort toggle
+        only sorts the cached primary keys if they are not too many.
+        """
+        if self.pk_list_cache_timeout is None:
+            return None
+        ordering = self.get_ordering()
+        key = self.get_pk_list_key(ordering)
+        any_key = self.get_pk_list_key(None)
+        cached = cache.cache.get_many([key, any_key])
+        if key in cached:
+            return cache.PackedPks(cached[key]) if cached[key] else None
+        pks = None
+        if cached.get(any_key):
+            pks = cache.PackedPks(cached[any_key])
+            if len(pks) <= self.pk_list_sort_cap:
+                qs = self.get_base_queryset().filter(pk__in=list(pks))
+                pks = self.ordered_pks(self.order_queryset(qs, ordering))
+            else:
+                pks = None
+        if pks is None:
+            qs = self.order_queryset(self.filter_queryset(), ordering)
+            pks = self.ordered_pks(qs, self.pk_list_max_size + 1)
+        data = None
+        if len(pks) <= self.pk_list_max_size:
+            data = cache.pack_pks(pks)
+        # False remembers that the primary keys can't be cached
+        entries = {key: data or False}
+        if data:
+            entries[any_key] = data
+        cache.cache.set_many(entries, self.pk_list_cache_timeout)
+        return cache.PackedPks(data) if data else None
+
+    def get_objects_by_pk(self, pks):
+        """Returns the objects of ``pks`` in the order of ``pks``"""
+        qs = self.prepare_queryset(self.get_base_queryset().filter(pk__in=list(pks)))
+        objects = dict((object.pk, object) for object in qs)
+        return [objects[pk] for pk in pks if pk in objects]
+
+    def get_pk_list_page(self, pks):
+        """Returns the page requested with ``PAGE_VAR`` of the objects
+        of ``pks``"""
+        paginator = Paginator(pks, self.list_per_page)
+        page = self.get_page(paginator)
+        return Page(self.get_objects_by_pk(page.object_list), page.number, paginator)
+
+    def get_show_all_rows(self, q):
+        """Returns the ``LazyRows`` of at most ``list_max_show_all`` objects
+        of ``q``, if ``count_results`` is not set the objects are fetched
+        at once instead of counted then fetched by chunks"""
+        q = q[:self.list_max_show_all]
+        if not self.count_results:
+            q = list(q)
+            return LazyRows(self, q, len(q), self.show_all_chunk_size)
+        return LazyRows(self, q, q.count(), self.show_all_chunk_size)
+
+    def can_show_all(self, page):
+        """Returns whether every object fits in a single page"""
+        if page.paginator is not None:
+            return page.paginator.count <= self.list_max_show_all
+        # the first page knows whether there is more
+        if page.number == 1 and not page.has_next():
+            return True
+        return False
 
     def get_results(self):
-        full_result_count = self.model_class.objects.count()
         q = self._queryset()
         if ALL_VAR in self.request.GET:
-            objects = q[self.list_max_show_all:]
+            full_result_count = self.get_full_result_count()
+            paginator = None
+            can_show_all = True
+            aggregates = self.get_aggregates(q, None)
+            objects = self.get_show_all_rows(q)
+            self.page_objects = objects.q
         else:
-            paginator = Paginator(q, self.list_per_page)
-            page = self.request.GET.get(PAGE_VAR)
-            try:
-                objects = paginator.page(page)
-            except PageNotAnInteger:
-                # If page is not an integer, deliver first page.
-                objects = paginator.page(1)
-            except EmptyPage:
-                # If page is out of range (e.g. 9999),
-                # deliver last page of results.
-                objects = paginator.page(paginator.num_pages)
-        paginator = objects
-        can_show_all = len(objects) < self.list_max_show_all
-        objects = list(self.items(objects))  # FIXME: template engine doesn't
-                                             # like generators
-        return dict(
+            pks = self.get_pk_list()
+            if pks is not None:
+                full_result_count = self.get_full_result_count()
+                paginator = self.get_pk_list_page(pks)
+            elif self.results_cache_timeout is None:
+                full_result_count = self.get_full_result_count()
+                paginator = self.paginate(q)
+            else:
+                full_result_count, paginator = self.get_cached_page(q)
+            can_show_all = self.can_show_all(paginator)
+            aggregates = self.get_aggregates(q, paginator)
+            objects = LazyRows(self, paginator.object_list, len(paginator))
+            self.page_objects = paginator.object_list
+        results = dict(
             full_result_count=full_result_count,
+            count_results=self.count_results,
             can_show_all=can_show_all,
             objects=objects,
-            paginator=objects,
+            paginator=paginator,
+            aggregates=aggregates,
+            page_aggregates=self.list_aggregates_page,
         )
+        results.update(self.get_page_urls(paginator))
+        return results
+
+    def get_aggregates(self, q, objects):
+        """Returns a list with an item per column of ``list_display``, the
+        item is ``None`` if the column has no aggregate otherwise it's a
+        dictionary with the value of the aggregate over the filtered queryset
+        ``q`` as ``total`` and if ``list_aggregates_page`` is set and
+        ``objects`` is not ``None`` the value of the aggregate over
+        ``objects`` as ``page``.
+
+        Every aggregate is computed with one query.
+        """
+        if not self.list_aggregates:
+            return None
+        aggregates = dict()
+        names = self.model_class._meta.get_all_field_names()
+        for index, item in enumerate(self.list_display):
+            if item in self.list_aggregates:
+                if item not in names:
+                    msg = '%s.list_aggregates: %r is not a field of %s' % (
+                        self.__class__.__name__, item, self.model_class.__name__)
+                    raise ImproperlyConfigured(msg)
+                function = self.list_aggregates[item]
+                if not callable(function):
+                    function = AGGREGATES[function]
+                aggregates['column_%s' % index] = function(item)
+        totals = q.aggregate(**aggregates)
+        if self.list_aggregates_page and objects is not None:
+            pks = [object.pk for object in objects]
+            page = q.filter(pk__in=pks).aggregate(**aggregates)
+        else:
+            page = dict()
+        results = list()
+        for index, item in enumerate(self.list_display):
+            name = 'column_%s' % index
+            if name in totals:
+                results.append(dict(total=totals[name], page=page.get(name)))
+            else:
+                results.append(None)
+        return results
 
     def _get_default_ordering(self):
         """Returns default ordering based on instance configuration falling
@@ -343,15 +947,44 @@ class SortableTable(LeafCompositeView, RequestOperationsMixin):
             else:
                 yield dict(text=item, sortable=False)
 
+    def compute_batch_columns(self, objects):
+        """Computes the values of batch columns for ``objects``.
+
+        A batch column is a callable in ``list_display`` with a ``batch``
+        attribute set to ``True``, it is called once with the list of objects
+        of the page and must return a mapping of primary keys to values, for
+        instance:
+
+        .. code-block:: python
+
+           def open_tickets(objects):
+               counts = Ticket.objects.filter(project__in=objects, open=True)
+               counts = counts.values_list('project').annotate(Count('pk'))
+               return dict(counts)
+           open_tickets.batch = True
+
+        Objects missing from the mapping are rendered as ``None``.
+        """
+        self.batch_results = dict()
+        for index, item in enumerate(self.list_display):
+            if getattr(item, 'batch', False):
+                self.batch_results[index] = item(objects)
+
     def item(self, object):
-        for item in self.list_display:
+        for index, item in enumerate(self.list_display):
             if item is unicode:
                 yield unicode(object)
+            elif getattr(item, 'batch', False):
+                yield self.batch_results[index].get(object.pk)
             elif callable(item):
                 yield item(object)
             elif item in self.model_class._meta.get_all_field_names():
                 field = self.model_class._meta.get_field_by_name(item)[0]
-                if len(field.choices):
+                if isinstance(field, models.ManyToManyField):
+                    # prefetched, see ``get_relation_plan``
+                    related = getattr(object, item).all()
+                    yield u', '.join(force_text(value) for value in related)
+                elif len(field.choices):
                     method_name = 'get_%s_display' % item
                     display_method = getattr(object, method_name)()
                     yield display_method
@@ -367,8 +1000,85 @@ class SortableTable(LeafCompositeView, RequestOperationsMixin):
                 raise Exception("Couldn't render %s in list_display" % item)
 
     def items(self, objects):
+        objects = list(objects)
+        self.compute_batch_columns(objects)
         for object in objects:
-            yield list(self.item(object))  # FIXME
+            # a row is rendered by an inner for loop that would turn
+            # a generator into a list anyway
+            yield list(self.item(object))
+
+    def export_item(self, object):
+        """Returns the values of ``object`` for an export row, it uses
+        ``SortableTable.item`` so that subclasses that render widgets
+        in cells like ``ChangeList`` export the plain values"""
+        return SortableTable.item(self, object)
+
+    def export_chunks(self):
+        """Generator over lists of the objects matching the current filters,
+        search and ordering, ``export_chunk_size`` objects at a time so that
+        only one chunk is alive at any time.
+
+        The ordered primary keys are read once, or taken from the primary
+        key list cache, then every chunk is fetched by primary key, so that
+        no query has to skip the rows of the previous chunks. Integer primary
+        keys are held packed, see ``composite.cache.compact_pks``."""
+        pks = self.get_pk_list()
+        if pks is None:
+            qs = self.order_queryset(self.filter_queryset(), self.get_ordering())
+            pks = cache.compact_pks(self.iter_ordered_pks(qs))
+        size = self.export_chunk_size or len(pks) or 1
+        return (self.get_objects_by_pk(pks[start:start + size])
+                for start in xrange(0, len(pks), size))
+
+    def export_headers(self):
+        """Returns the headers of the export, it uses
+        ``SortableTable.headers`` so that the columns of widgets added by
+        subclasses like ``ChangeList`` are not exported"""
+        return SortableTable.headers(self)
+
+    def export_rows(self):
+        """Generator over the header row followed by the value rows, the
+        values are converted by the export format"""
+        yield [force_text(header['text']) for header in self.export_headers()]
+        for chunk in self.export_chunks():
+            self.compute_batch_columns(chunk)
+            for object in chunk:
+                yield list(self.export_item(object))
+
+    def export_csv(self):
+        writer = csv.writer(Echo())
+        for row in self.export_rows():
+            row = ['' if value is None else force_text(value).encode('utf-8')
+                   for value in row]
+            yield writer.writerow(row)
+
+    def export_jsonl(self):
+        for row in self.export_rows():
+            # booleans and numbers stay JSON values, the rest is text
+            row = [value if isinstance(value, JSON_TYPES) else force_text(value)
+                   for value in row]
+            yield json.dumps(row) + '\n'
+
+    def export(self, format):
+        """Returns a streamed response with every row matching the current
+        request in ``format``, one of ``export_formats``"""
+        if format not in self.export_formats:
+            raise Http404('Unknown export format %r' % format)
+        if format == 'csv':
+            content, content_type = self.export_csv(), 'text/csv'
+        else:
+            content, content_type = self.export_jsonl(), 'application/x-ndjson'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = '%s.%s' % (self.model_class._meta.module_name, format)
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+    def get(self, request, *args, **kwargs):
+        """Returns an export of the table if ``EXPORT_VAR`` is in the query
+        string, the parent composites send it to the client as is"""
+        if EXPORT_VAR in request.GET:
+            return self.export(request.GET[EXPORT_VAR])
+        return super(SortableTable, self).get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super(SortableTable, self).get_context_data(**kwargs)
@@ -388,70 +1098,379 @@ class ChangeList(SortableTable):
 
     list_editable = ()
 
+    # the formset holds every object anyway
+    show_all_chunk_size = None
+
+    # save edited objects with an UPDATE of the changed columns per distinct
+    # set of values instead of a ``save`` per object, it's ignored if the
+    # model overrides ``save``
+    bulk_save = False
+    # send ``pre_save`` and ``post_save`` for objects saved in bulk
+    bulk_save_signals = True
+
+    # callables applied to the selected objects, see ``composite.actions``
+    actions = ()
+    # number of objects an action is applied to per transaction
+    action_chunk_size = 1000
+
+    _formset = None
+
     def formfield_for_dbfield(self, db_field, **kwargs):
+        """Returns the form field of ``db_field``.
+
+        It's called when the form classes are built, which happens once per
+        ``ChangeList`` class and configuration, so it must not depend on the
+        request, customize the formset in ``formset`` instead.
+        """
         return db_field.formfield(**kwargs)
 
+    def _cached_class(self, kind, kwargs, factory):
+        """Returns the class built by ``factory`` for ``kind`` and ``kwargs``
+        in the current configuration, building it on first use"""
+        key = (
+            kind,
+            self.__class__,
+            self.model_class,
+            tuple(self.list_editable),
+            tuple(sorted(kwargs.items())),
+        )
+        try:
+            return FORM_CLASSES[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # some kwargs are not hashable, do not cache
+            return factory()
+        return FORM_CLASSES.setdefault(key, factory())
+
     def form_class(self, **kwargs):
         """
         Returns a Form class for use in the Formset on the changelist page.
         """
-        defaults = {
-            'formfield_callback': self.formfield_for_dbfield,
-        }
-        defaults.update(kwargs)
-        return modelform_factory(self.model_class, **defaults)
+        def factory():
+            defaults = {
+                'formfield_callback': self.formfield_for_dbfield,
+            }
+            defaults.update(kwargs)
+            return modelform_factory(self.model_class, **defaults)
+        return self._cached_class('form', kwargs, factory)
 
     def formset_class(self, **kwargs):
         """
         Returns a FormSet class for use on the changelist page if list_editable
         is used.
         """
-        defaults = {
-            'formfield_callback': self.formfield_for_dbfield,
-        }
-        defaults.update(kwargs)
-        FormSet = modelformset_factory(
-            self.model_class,
-            self.form_class(),
-            extra=0,
-            fields=self.list_editable,
-            **defaults
-        )
-        return FormSet
+        def factory():
+            defaults = {
+                'formfield_callback': self.formfield_for_dbfield,
+            }
+            defaults.update(kwargs)
+            FormSet = modelformset_factory(
+                self.model_class,
+                self.form_class(),
+                extra=0,
+                fields=self.list_editable,
+                **defaults
+            )
+            return FormSet
+        return self._cached_class('formset', kwargs, factory)
+
+    def formset_queryset(self):
+        """Returns the queryset of the objects of the current page in the
+        order of the rows"""
+        if self.page_objects is None:
+            self.get_results()
+        pks = [object.pk for object in self.page_objects]
+        qs = self.model_class._default_manager.filter(pk__in=pks)
+        return self.order_queryset(qs, self.get_ordering())
 
     def formset(self):
-        qs = self._queryset()
-        FormSet = self.formset_class()
-        if self.request.method == 'POST':
-            formset = FormSet(self.request.POST, self.request.FILES, queryset=qs)
-        else:
-            formset = FormSet(queryset=qs)
-        return formset
+        """Returns the formset of the objects of the current page, it's
+        built once per request"""
+        if self._formset is None:
+            qs = self.formset_queryset()
+            FormSet = self.formset_class()
+            if self.request.method == 'POST':
+                formset = FormSet(self.request.POST, self.request.FILES, queryset=qs)
+            else:
+                formset = FormSet(queryset=qs)
+            self._formset = formset
+            self._forms = dict((form.instance.pk, form) for form in formset.forms)
+        return self._formset
 
     def get_context_data(self):
         context = super(ChangeList, self).get_context_data()
         context['formset'] = self.formset()
+        if self.actions:
+            context['action_form'] = self.get_action_form()
         return context
 
+    def get_actions(self):
+        """Returns a ``SortedDict`` of the actions by name"""
+        actions = SortedDict()
+        for action in self.actions:
+            actions[action.__name__] = action
+        return actions
+
+    def get_action_form(self, data=None):
+        form = ActionForm(data, auto_id=None)
+        choices = [('', '---------')]
+        for name, action in self.get_actions().items():
+            choices.append((name, getattr(action, 'short_description', name)))
+        form.fields['action'].choices = choices
+        # a checkbox instead of the hidden input set by the admin javascript
+        select_across = form.fields['select_across']
+        select_across.widget = CheckboxInput({'class': 'select-across'})
+        select_across.initial = False
+        return form
+
+    def response_action(self, request):
+        """Applies the action submitted in ``request`` to the selected objects
+        and returns a redirect, with a warning if no action was selected.
+
+        If ``select_across`` is set the action is applied to every object
+        matching the filters and the search in a background thread,
+        the progress of the job can be retrieved as JSON with
+        ``JOB_VAR``. Otherwise the action is applied to the objects selected
+        in the page before the response is returned.
+        """
+        form = self.get_action_form(request.POST)
+        if not form.is_valid():
+            messages.warning(request, _("No action selected."))
+            return redirect(request.get_full_path())
+        action = self.get_actions()[form.cleaned_data['action']]
+        select_across = form.cleaned_data['select_across']
+        selected = request.POST.getlist(ACTION_CHECKBOX_NAME)
+        if not selected and not select_across:
+            msg = _("Items must be selected in order to perform "
+                    "actions on them. No items have been changed.")
+            messages.warning(request, msg)
+            return redirect(request.get_full_path())
+        qs = self._queryset()
+        if not select_across:
+            qs = qs.filter(pk__in=selected)
+        job = Job(action, qs, self.action_chunk_size)
+        if select_across:
+            job.start()
+            url = self.get_query_string({JOB_VAR: job.id})
+            msg = _('The action is applied in the background to %(count)s objects, '
+                    'see <a href="%(url)s">its progress</a>.')
+            messages.info(request, mark_safe(msg % dict(count=job.total, url=escape(url))))
+        else:
+            job.run()
+        return redirect(request.get_full_path())
+
+    def get(self, request, *args, **kwargs):
+        """Returns the progress of a job as JSON if ``JOB_VAR`` is in the
+        query string"""
+        if JOB_VAR in request.GET:
+            progress = Job.progress(request.GET[JOB_VAR])
+            if progress is None:
+                raise Http404('Unknown job')
+            return json_response(progress)
+        return super(ChangeList, self).get(request, *args, **kwargs)
+
+    def headers(self):
+        if self.actions:
+            yield dict(text='', sortable=False)
+        for header in super(ChangeList, self).headers():
+            yield header
+
+    def get_aggregates(self, q, objects):
+        aggregates = super(ChangeList, self).get_aggregates(q, objects)
+        if aggregates is not None and self.actions:
+            # under the column of the checkboxes
+            aggregates.insert(0, None)
+        return aggregates
+
     def items(self, objects):
-        for i, object in enumerate(objects):
-            yield list(self.item(object, i))  # FIXME
+        objects = list(objects)
+        self.compute_batch_columns(objects)
+        self.formset()
+        for object in objects:
+            # objects without a form, e.g. a submitted formset of a page
+            # that changed since, are rendered read only
+            yield list(self.item(object, self._forms.get(object.pk)))
 
-    def item(self, object, i):
-        formset = self.formset()
-        form = formset.forms[i]
+    def item(self, object, form):
+        if self.actions:
+            yield checkbox.render(ACTION_CHECKBOX_NAME, force_text(object.pk))
         fields = super(ChangeList, self).item(object)
         for name, field in zip(self.list_display, fields):
-            if name in self.list_editable:  # Use formset.form instead
+            if name in self.list_editable and form is not None:  # Use formset.form instead
                 field = form[name]
                 field = mark_safe(force_text(field.errors) + force_text(field))
                 yield field
             else:
                 yield field
 
+    def save_form(self, form):
+        """Returns the unsaved object of a changed ``form``"""
+        return form.save(commit=False)
+
+    def after_save(self, objects):
+        """Called with the saved objects before the transaction is
+        committed"""
+        pass
+
+    def save_forms(self, forms):
+        """Saves the objects of the changed ``forms`` in a single
+        transaction and returns them.
+
+        If ``bulk_save`` is set and the model doesn't override ``save`` the
+        changed columns are updated with an ``UPDATE`` per distinct set of
+        changed values, otherwise every object is saved.
+        """
+        using = router.db_for_write(self.model_class)
+        with transaction.commit_on_success(using=using):
+            objects = [self.save_form(form) for form in forms]
+            if self.bulk_save and self.can_bulk_save():
+                self.bulk_update(zip(forms, objects), using)
+            else:
+                for object in objects:
+                    object.save(using=using)
+            for form in forms:
+                form.save_m2m()
+            self.after_save(objects)
+        return objects
+
+    def can_bulk_save(self):
+        """Returns whether the objects can be saved without ``save``, it's
+        not the case if the model overrides it"""
+        return self.model_class.save.__func__ is models.Model.save.__func__
+
+    def bulk_update(self, forms_and_objects, using):
+        """Updates the fields of ``list_editable`` that changed in each form
+        grouping the objects with the same new values in a single ``UPDATE``
+        restricted to the changed columns.
+
+        Like ``Model.save`` the values are read with ``Field.pre_save``, the
+        other fields whose value it changes, like ``auto_now`` dates, are
+        updated too.
+        """
+        meta = self.model_class._meta
+        # fields that may compute their value when the object is saved
+        computed = [field for field in meta.local_fields
+                    if not field.primary_key
+                    and type(field).pre_save.__func__ is not models.Field.pre_save.__func__]
+        updates = SortedDict()
+        for form, object in forms_and_objects:
+            fields = [meta.get_field(name) for name in form.changed_data
+                      if name in self.list_editable]
+            # many to many fields are saved by ``save_m2m``
+            fields = [field for field in fields
+                      if not isinstance(field, models.ManyToManyField)]
+            if not fields:
+                continue
+            if any(isinstance(field, models.FileField) for field in fields):
+                # files are stored by ``Model.save``
+                object.save(using=using)
+                continue
+            if self.bulk_save_signals:
+                # before the values are read so that receivers can change them
+                pre_save.send(
+                    sender=self.model_class,
+                    instance=object,
+                    raw=False,
+                    using=using,
+                )
+            values = [(field.name, field.pre_save(object, False)) for field in fields]
+            for field in computed:
+                if field not in fields:
+                    old = getattr(object, field.attname)
+                    value = field.pre_save(object, False)
+                    if value != old:
+                        values.append((field.name, value))
+            values = tuple(values)
+            try:
+                hash(values)
+            except TypeError:
+                key = ('pk', object.pk)
+            else:
+                key = values
+            updates.setdefault(key, (values, list()))[1].append(object)
+        for values, objects in updates.values():
+            qs = self.model_class._default_manager.using(using)
+            qs.filter(pk__in=[object.pk for object in objects]).update(**dict(values))
+            if self.bulk_save_signals:
+                for object in objects:
+                    post_save.send(
+                        sender=self.model_class,
+                        instance=object,
+                        created=False,
+                        raw=False,
+                        using=using,
+                    )
+
+    def partial_formset(self):
+        """Returns the formset bound to the submitted forms, its queryset
+        only has the objects whose primary key was submitted.
+
+        Raises ``ValidationError`` if there are more forms than the formset
+        allows, a primary key is not valid or an object is not in the table.
+        """
+        FormSet = self.formset_class()
+        prefix = FormSet.get_default_prefix()
+        try:
+            total = int(self.request.POST['%s-TOTAL_FORMS' % prefix])
+        except (KeyError, ValueError):
+            total = 0
+        # Django 1.4.0 formsets build as many forms as TOTAL_FORMS says
+        max_forms = getattr(FormSet, 'absolute_max', None) or FormSet.max_num or 1000
+        if total > max_forms:
+            raise ValidationError('Too many forms')
+        pk_field = self.model_class._meta.pk
+        pks = set()
+        for index in xrange(total):
+            pk = self.request.POST.get('%s-%s-%s' % (prefix, index, pk_field.name))
+            if not pk:
+                raise ValidationError('Unknown object')
+            pks.add(pk_field.to_python(pk))
+        qs = self._queryset().filter(pk__in=pks)
+        # the formset reuses the result cache of ``qs``
+        if set(force_text(object.pk) for object in qs) != set(force_text(pk) for pk in pks):
+            # objects filtered out of the table
+            raise ValidationError('Unknown object')
+        return FormSet(self.request.POST, self.request.FILES, queryset=qs)
+
+    def response_partial_save(self, request):
+        """Saves the rows submitted with ``PARTIAL_SAVE_VAR``.
+
+        Instead of the whole formset of the page, the client submits a
+        formset made only of the changed rows, ``TOTAL_FORMS`` and
+        ``INITIAL_FORMS`` being the number of changed rows. Only those
+        objects are loaded, validated and saved.
+
+        The response is JSON, with the primary keys of the saved objects
+        as ``saved`` or with the errors by primary key as ``errors`` and
+        a 400 status, the parent composites send it to the client as is.
+        """
+        try:
+            formset = self.partial_formset()
+        except ValidationError as error:
+            errors = [force_text(message) for message in error.messages]
+            return json_response(dict(errors={'__all__': errors}), 400)
+        if not formset.is_valid():
+            errors = dict()
+            for form in formset.forms:
+                if form.errors:
+                    errors[force_text(form.instance.pk)] = dict(
+                        (name, [force_text(error) for error in field_errors])
+                        for name, field_errors in form.errors.items()
+                    )
+            return json_response(dict(errors=errors), 400)
+        forms = [form for form in formset.forms if form.has_changed()]
+        objects = self.save_forms(forms)
+        return json_response(dict(saved=[force_text(object.pk) for object in objects]))
+
     def post(self, request, *args, **kwargs):
+        if self.list_editable and PARTIAL_SAVE_VAR in request.POST:
+            return self.response_partial_save(request)
+        if self.actions and 'action' in request.POST and '_save' not in request.POST:
+            response = self.response_action(request)
+            if response is not None:
+                return response
         context = self.get_context_data(**kwargs)
-        # FIXME: catch action failed
 
         # Handle POSTed bulk-edit data.
         if (request.method == 'POST'
@@ -459,17 +1478,9 @@ class ChangeList(SortableTable):
             and '_save' in request.POST):
             formset = self.formset()
             if formset.is_valid():
-                changecount = 0
-                for form in formset.forms:
-                    if form.has_changed():
-                        # FIXME: add hook
-                        # cf. django/contrib/admin/options.py:changelist_view
-                        obj = form.save()
-                        obj.save()
-                        # form.save_m2m()
-                        # change_msg = self.construct_change_message(request, form, None)
-                        # self.log_change(request, obj, change_msg)
-                        changecount += 1
+                forms = [form for form in formset.forms if form.has_changed()]
+                objects = self.save_forms(forms)
+                changecount = len(objects)
 
                 if changecount:
                     meta = self.model_class._meta
@@ -481,43 +1492,124 @@ class ChangeList(SortableTable):
                                     "%(count)s %(name)s were changed successfully.",
                                     changecount) % {'count': changecount,
                                                     'name': name,
-                                                    'obj': force_text(obj)}
+                                                    'obj': force_text(objects[-1])}
                     messages.info(request, msg)
-                url = '%s%s' % (
-                    self.request.get_full_path(),
-                    self.request.META['QUERY_STRING']
-                )
-                return redirect(url)
+                return redirect(self.request.get_full_path())
         return self.render_to_response(context)
 
 
+class SpecFilterComposite(LeafCompositeView):
+    """Renders the choices of the filter ``spec`` of the parent ``Filter``
+    using the template of the spec, with their counts if ``facets``
+    is not ``None``"""
+
+    spec = None
+    facets = None
+
+    def get_template_names(self):
+        return [self.spec.template]
+
+    def get_context_data(self, **kwargs):
+        ctx = super(SpecFilterComposite, self).get_context_data(**kwargs)
+        ctx['title'] = self.spec.title
+        ctx['choices'] = list(self.spec.choices(self.parent))
+        if self.facets is not None:
+            for choice in ctx['choices']:
+                choice['count'] = self.facets.count(choice)
+                if choice['count'] is not None:
+                    choice['display'] = u'%s (%s)' % (choice['display'], choice['count'])
+        ctx['spec'] = self.spec
+        return ctx
+
+
 class Filter(StackedCompositeView, RequestOperationsMixin):
 
     template_name = 'composite/filter.html'
 
     list_filter = ()
 
+    # seconds the choices of the field filters are cached, None to query
+    # them on every request, see ``composite.filters``
+    choices_cache_timeout = None
+
+    # display next to the choices of the field filters the number of
+    # objects they match, given the other filters
+    show_facets = False
+
+    # table filtered by the specs, set by the table, the facets are
+    # counted over the model if it's None
+    table = None
+
+    # specs of the current request, see ``get_filters``
+    filter_specs = None
+    # number of specs built so far, they are built once per request
+    spec_constructions = 0
+    _filters = None
+    _filters_request = None
+
     def __init__(self,  **kwargs):
         self.model_class = kwargs.pop('model_class', None)
         super(Filter, self).__init__(**kwargs)
 
-    def _composites(self, request, *args, **kwargs):
-        for spec in self.filter_specs:
-            class SpecFilterComposite(LeafCompositeView):
+    def get_choices_cache_scope(self):
+        """Returns what, besides the model and the field, changes the
+        choices of a filter, by default the user"""
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated():
+            return user.pk
+        return None
 
-                template_name = spec.template
+    def get_facets_queryset(self, spec):
+        """Returns the queryset the facets of ``spec`` are counted from,
+        the objects of the table matching the search and every other spec
+        or if there is no table the objects of the model matching every
+        other spec"""
+        if self.table is not None:
+            # the table may be rendered after the filter
+            self.table.request = self.request
+            return self.table.filter_queryset(exclude_spec=spec)
+        qs = self.model_class._default_manager.all()
+        for other in self.get_filter_specs():
+            if other is not spec:
+                new_qs = other.queryset(self.request, qs)
+                if new_qs is not None:
+                    qs = new_qs
+        return qs
 
-                def get_context_data(self, **kwargs):
-                    ctx = super(SpecFilterComposite, self).get_context_data(**kwargs)
-                    ctx['title'] = spec.title
-                    ctx['choices'] = list(spec.choices(self.parent))
-                    ctx['spec'] = spec
-                    return ctx
+    def get_facets(self):
+        """Returns a dictionary mapping the specs that support it to their
+        ``composite.filters.Facets``, see ``get_facets_queryset``"""
+        facets = dict()
+        for spec in self.get_filter_specs():
+            if filters.has_facets(spec):
+                facets[spec] = filters.Facets(spec, self.get_facets_queryset(spec))
+        return facets
 
-            spec_composite = SpecFilterComposite(parent=self)
-            yield spec_composite
+    def get_filter_specs(self):
+        """Returns the specs of the current request"""
+        return self.get_filters()[0]
+
+    def _composites(self, request, *args, **kwargs):
+        filter_specs = self.get_filter_specs()
+        facets = self.get_facets() if self.show_facets else dict()
+        for spec in filter_specs:
+            yield SpecFilterComposite(parent=self, spec=spec, facets=facets.get(spec))
 
     def get_filters(self):
+        """Returns a ``(filter_specs, has_filters, use_distinct)`` tuple for
+        the current request, it's computed once per request and shared by
+        the table and the filter composites"""
+        if self._filters is None or self._filters_request is not self.request:
+            self._filters = self.build_filters()
+            self._filters_request = self.request
+            logger.debug(
+                '%s filter specs built: %s',
+                self.__class__.__name__,
+                self.spec_constructions,
+            )
+        return self._filters
+
+    def build_filters(self):
         lookup_params = dict(self.request.GET.items())
         use_distinct = False
 
@@ -543,7 +1635,7 @@ class Filter(StackedCompositeView, RequestOperationsMixin):
                         # This is simply a field name, so use the default
                         # FieldListFilter class that has been registered for
                         # the type of the given field.
-                        field, field_list_filter_class = list_filter, FieldListFilter.create
+                        field, field_list_filter_class = list_filter, filters.create
                     if not isinstance(field, models.Field):
                         field_path = field
                         field = get_fields_from_path(self.model_class, field_path)[-1]
@@ -563,6 +1655,7 @@ class Filter(StackedCompositeView, RequestOperationsMixin):
                             field_path
                         )
                     )
+                self.spec_constructions += 1
                 if spec and spec.has_output():
                     filter_specs.append(spec)
         self.filter_specs = filter_specs